@@ -1,9 +1,59 @@
+import ast
+import functools
+import operator
+
+# 계산기에서 허용하는 연산자 (eval() 대신 AST를 직접 평가합니다)
+_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+    ast.UAdd: operator.pos,
+    ast.USub: operator.neg,
+}
+# 9**9**9, (10**999)**999 같은 거대 정수 연산으로 프로세스가 멈추는 것을 방지합니다.
+_MAX_EXPONENT = 1000
+_MAX_INT_BITS = 10_000
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_expression(expression: str) -> ast.expr:
+    return ast.parse(expression.strip(), mode="eval").body
+
+
+def _check_binop(op: ast.operator, left, right) -> None:
+    """연산을 실행하기 전에 지수와 정수 결과의 크기(비트 수)를 추정해 상한을 넘으면 거부합니다."""
+    if isinstance(op, ast.Pow):
+        if abs(right) > _MAX_EXPONENT:
+            raise ValueError(f"지수가 너무 큽니다: {right}")
+        if isinstance(left, int) and isinstance(right, int) and abs(left).bit_length() * right > _MAX_INT_BITS:
+            raise ValueError("거듭제곱 결과가 너무 큽니다.")
+    elif isinstance(op, ast.Mult) and isinstance(left, int) and isinstance(right, int):
+        if abs(left).bit_length() + abs(right).bit_length() > _MAX_INT_BITS:
+            raise ValueError("곱셈 결과가 너무 큽니다.")
+
+
+def _eval_node(node: ast.AST):
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _OPERATORS:
+        left, right = _eval_node(node.left), _eval_node(node.right)
+        _check_binop(node.op, left, right)
+        return _OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _OPERATORS:
+        return _OPERATORS[type(node.op)](_eval_node(node.operand))
+    raise ValueError(f"허용되지 않는 표현식입니다: {ast.unparse(node)}")
+
+
 # 1. 계산기 함수 정의
 def calculator(expression: str):
     """문자열 형태의 수학적 표현식을 계산하여 결과를 반환합니다."""
     print(f"계산기 함수에 입력될 표현식: {expression}")
-    # 주의: eval()은 실제 프로덕션 환경에서는 신중하게 사용해야 합니다.
-    return eval(expression)
+    # eval()은 임의 코드를 실행할 수 있으므로, 숫자와 사칙연산만 허용하는 AST 평가기를 사용합니다.
+    return _eval_node(_parse_expression(expression))
 
 
 # 모델 생성 (초기) - 이 부분은 tool call을 위해 아래에서 다시 정의됩니다.
@@ -1,13 +1,18 @@
 # streamlit run react_agent_app.py
 
+import ast
+import collections
 import collections.abc
+import functools
 import json
+import logging
+import operator
 import os
 import re
-import urllib.parse
-import urllib.request
+from concurrent.futures import ThreadPoolExecutor
 from typing import Any, Dict, List, Literal, Type
 
+import httpx
 import instructor
 import streamlit as st
 import wolframalpha
@@ -15,9 +20,8 @@ from dotenv import load_dotenv
 from langchain.tools import BaseTool, tool
 from langchain.tools.render import render_text_description
 from langchain_community.tools.tavily_search import TavilySearchResults
-from langchain_core.prompts import ChatPromptTemplate
 from langchain_google_genai import ChatGoogleGenerativeAI
-from pydantic import BaseModel, Field, PrivateAttr
+from pydantic import BaseModel, ConfigDict, Field, PrivateAttr, TypeAdapter
 
 st.set_page_config(page_title="ReAct Agent", page_icon="🤖", layout="wide")
 
@@ -25,6 +29,9 @@ st.set_page_config(page_title="ReAct Agent", page_icon="🤖", layout="wide")
 
 load_dotenv()
 
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "WARNING"))
+logger = logging.getLogger("react_agent")
+
 google_api_key = os.getenv("GOOGLE_API_KEY")
 tavily_api_key = os.getenv("TAVILY_API_KEY")
 wolfram_app_id = os.getenv("WOLFRAM_ALPHA_APP_ID")
@@ -38,10 +45,97 @@ if not all([google_api_key, tavily_api_key, wolfram_app_id]):
     )
 
 # --- 세션 상태 초기화 ---
+MAX_HISTORY_TURNS = 20
+MAX_CACHED_RESPONSES = 128
+
 if "messages" not in st.session_state:
     st.session_state.messages = []
 if "chat_history" not in st.session_state:
-    st.session_state.chat_history = []
+    # 프롬프트 길이(=prefill 비용)가 세션 길이에 따라 끝없이 늘어나지 않도록 최근 대화만 유지합니다.
+    st.session_state.chat_history = collections.deque(maxlen=MAX_HISTORY_TURNS)
+if "response_cache" not in st.session_state:
+    # (정규화된 질문, 최근 대화 해시) -> 최종 답변. 같은 질문이 반복되면 ReAct 루프 전체를 건너뜁니다.
+    st.session_state.response_cache = collections.OrderedDict()
+
+
+# --- 안전한 산술 계산기 ---
+# eval() 대신 사칙연산 노드만 허용하는 AST 평가기를 사용합니다.
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+    ast.FloorDiv: operator.floordiv,
+    ast.Mod: operator.mod,
+    ast.Pow: operator.pow,
+}
+_UNARY_OPERATORS = {ast.UAdd: operator.pos, ast.USub: operator.neg}
+# 9**9**9, (10**999)**999 같은 거대 정수 연산으로 프로세스가 멈추는 것을 방지합니다.
+_MAX_EXPONENT = 1000
+_MAX_INT_BITS = 10_000
+
+
+def _check_binop(op: ast.operator, left: Any, right: Any) -> None:
+    """연산을 실행하기 전에 지수와 정수 결과의 크기(비트 수)를 추정해 상한을 넘으면 거부합니다."""
+    if isinstance(op, ast.Pow):
+        if abs(right) > _MAX_EXPONENT:
+            raise ValueError(f"지수가 너무 큽니다: {right}")
+        if isinstance(left, int) and isinstance(right, int) and abs(left).bit_length() * right > _MAX_INT_BITS:
+            raise ValueError("거듭제곱 결과가 너무 큽니다.")
+    elif isinstance(op, ast.Mult) and isinstance(left, int) and isinstance(right, int):
+        if abs(left).bit_length() + abs(right).bit_length() > _MAX_INT_BITS:
+            raise ValueError("곱셈 결과가 너무 큽니다.")
+
+
+def _eval_node(node: ast.AST) -> Any:
+    if isinstance(node, ast.Constant) and type(node.value) in (int, float, complex):
+        return node.value
+    if isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+        left, right = _eval_node(node.left), _eval_node(node.right)
+        _check_binop(node.op, left, right)
+        return _BINARY_OPERATORS[type(node.op)](left, right)
+    if isinstance(node, ast.UnaryOp) and type(node.op) in _UNARY_OPERATORS:
+        return _UNARY_OPERATORS[type(node.op)](_eval_node(node.operand))
+    raise ValueError(f"허용되지 않는 표현식입니다: {ast.unparse(node)}")
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_expression(expression: str) -> ast.expr:
+    """표현식을 한 번만 파싱하여 캐시합니다. ReAct 루프에서 같은 식이 반복될 때 재파싱을 건너뜁니다."""
+    return ast.parse(expression.strip(), mode="eval").body
+
+
+def _safe_eval(expression: str) -> Any:
+    return _eval_node(_parse_expression(expression))
+
+
+# 숫자와 산술 기호로만 이루어진 식은 결과가 항상 같으므로 결과 자체를 캐시합니다.
+_ARITHMETIC_RE = re.compile(r"[\d+\-*/().%\s]+")
+_ARITHMETIC_OPERATOR_RE = re.compile(r"[+\-*/%]")
+
+
+@functools.lru_cache(maxsize=1024)
+def _eval_arithmetic(expression: str) -> Any:
+    return _safe_eval(expression)
+
+
+@st.cache_resource
+def get_wolfram_client() -> httpx.Client:
+    # WolframAlpha 호출은 하나의 클라이언트로 커넥션을 재사용합니다 (매 호출마다 TCP/TLS 재연결 방지).
+    # 모듈 전역으로 두면 Streamlit 리런마다 클라이언트가 새로 만들어져 커넥션 풀이 누수됩니다.
+    return httpx.Client(timeout=15.0, limits=httpx.Limits(max_keepalive_connections=5))
+
+
+# "Result:" 뒤의 최대 3줄을 한 번의 스캔으로 추출합니다.
+_WOLFRAM_RESULT_RE = re.compile(r"Result:(.*(?:\n.*){0,2})")
+
+
+# 블로그 템플릿은 고정 문자열이므로 모듈 상수로 두고 조회만 합니다.
+_BLOG_TEMPLATES = {
+    "기술 분석": "## 제목\\n\\n### 1. 기술 개요\\n\\n### 2. 핵심 작동 원리\\n\\n### 3. 장단점 분석\\n\\n### 4. 실무 적용 사례\\n\\n### 5. 결론 및 향후 전망",
+    "제품 리뷰": "## 제목\\n\\n### 1. 첫인상 및 디자인\\n\\n### 2. 주요 기능 및 성능 테스트\\n\\n### 3. 실사용 후기\\n\\n### 4. 총평 및 추천 대상",
+}
+_BLOG_TEMPLATE_ERROR = "오류: '기술 분석' 또는 '제품 리뷰' 스타일만 지원합니다."
 
 
 # --- 2. Agent 구성 요소 (Tool, LLM) 정의 ---
@@ -58,7 +152,9 @@ def get_tools():
     def calculator_tool(expression: str) -> str:
         """간단한 사칙연산이나 숫자 계산에만 사용하세요."""
         try:
-            return str(eval(expression))
+            if _ARITHMETIC_RE.fullmatch(expression):
+                return str(_eval_arithmetic(expression))
+            return str(_safe_eval(expression))
         except Exception as e:
             return f"계산 오류: {e}"
 
@@ -70,9 +166,6 @@ def get_tools():
     def wolfram_alpha_tool(query: str) -> str:
         """복잡한 수학 문제, 방정식, 미적분, 화학식, 물리 공식, 단위 변환 등에 사용합니다."""
         try:
-            import urllib.parse
-            import urllib.request
-
             api_key = os.environ.get("WOLFRAM_ALPHA_APP_ID")
             if not api_key:
                 return "API 키가 설정되지 않았습니다."
@@ -83,29 +176,24 @@ def get_tools():
             # URL 파라미터 구성
             params = {"input": query, "appid": api_key, "maxchars": 2000}  # 응답 길이 제한
 
-            # URL 인코딩
-            encoded_params = urllib.parse.urlencode(params)
-            full_url = f"{base_url}?{encoded_params}"
-
-            print(f"디버깅: 요청 URL: {full_url}")
+            logger.debug("WolframAlpha 요청: %s (input=%s)", base_url, query)
 
             # 요청 실행
-            with urllib.request.urlopen(full_url) as response:
-                result = response.read().decode("utf-8")
-                print(f"디버깅: LLM API 응답 성공")
+            response = get_wolfram_client().get(base_url, params=params)
+            response.raise_for_status()
+            result = response.text
+            logger.debug("WolframAlpha LLM API 응답 성공 (%d bytes)", len(response.content))
 
-                # 결과에서 핵심 정보만 추출
-                if "Result:" in result:
-                    # "Result:" 다음 부분만 추출
-                    result_section = result.split("Result:")[1].split("\n")[0:3]
-                    clean_result = "Result: " + "\n".join(result_section)
-                    return clean_result.strip()
+            # 결과에서 핵심 정보만 추출 ("Result:" 다음 부분만)
+            match = _WOLFRAM_RESULT_RE.search(result)
+            if match:
+                return f"Result: {match.group(1)}".strip()
 
-                return result[:500] + "..." if len(result) > 500 else result
+            return result[:500] + "..." if len(result) > 500 else result
 
-        except urllib.error.HTTPError as e:
-            error_code = e.code
-            error_msg = e.read().decode("utf-8") if hasattr(e, "read") else str(e)
+        except httpx.HTTPStatusError as e:
+            error_code = e.response.status_code
+            error_msg = e.response.text
 
             if error_code == 501:
                 return f"WolframAlpha가 쿼리를 이해하지 못했습니다: '{query}'. 다른 표현으로 시도해보세요."
@@ -126,12 +214,7 @@ def get_tools():
     @tool(args_schema=BlogTemplateInput)
     def blog_template_tool(style: str) -> str:
         """블로그 글의 기본 구조를 생성합니다."""
-        if style == "기술 분석":
-            return "## 제목\\n\\n### 1. 기술 개요\\n\\n### 2. 핵심 작동 원리\\n\\n### 3. 장단점 분석\\n\\n### 4. 실무 적용 사례\\n\\n### 5. 결론 및 향후 전망"
-        elif style == "제품 리뷰":
-            return "## 제목\\n\\n### 1. 첫인상 및 디자인\\n\\n### 2. 주요 기능 및 성능 테스트\\n\\n### 3. 실사용 후기\\n\\n### 4. 총평 및 추천 대상"
-        else:
-            return "오류: '기술 분석' 또는 '제품 리뷰' 스타일만 지원합니다."
+        return _BLOG_TEMPLATES.get(style, _BLOG_TEMPLATE_ERROR)
 
     # --- Tool 5: 사용자에게 질문하기 ---
     class QuestionInput(BaseModel):
@@ -209,8 +292,12 @@ def get_llm_and_template(_google_api_key, _tools):
     llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
     structured_llm = instructor.from_provider("google/gemini-2.5-flash")
     rendered_tools = render_text_description(_tools)
-    action_schema = json.dumps(Action.model_json_schema(), indent=2).replace("{", "{{").replace("}", "}}")
-    template = f"""
+    # Action 스키마도 리소스 캐시와 함께 한 번만 직렬화합니다 (리런마다 다시 만들지 않음).
+    # 손으로 붙여 넣은 리터럴 대신 모델에서 생성하므로 Action/ToolCall을 고쳐도 스키마가 어긋나지 않습니다.
+    action_schema = json.dumps(Action.model_json_schema(), indent=2)
+    # 반복/턴마다 변하지 않는 부분(MISSION~WORKFLOW)은 한 번만 렌더링해 두고,
+    # 매 반복에서는 뒤에 CONTEXT만 이어 붙여 LLM 제공자의 프리픽스 캐시가 적중하도록 합니다.
+    static_prefix = f"""
     # MISSION
     당신은 사용자의 복잡한 요구사항을 해결하는 최상위 AI 어시스턴트입니다.
     당신은 'Thought'와 'Action'을 반복하는 ReAct 패턴을 사용하여 문제를 단계적으로 해결해야 합니다.
@@ -226,6 +313,7 @@ def get_llm_and_template(_google_api_key, _tools):
     1. 'thought': 현재 상황 분석과 다음 행동 계획을 서술하는 문자열
     2. 'tool': 사용할 도구의 이름 또는 'Final Answer'
     3. 'tool_input': 선택된 도구에 전달할 입력값
+    4. 'parallel_actions' (선택): 'tool'과 서로 독립적이어서 동시에 실행해도 되는 추가 도구 호출 목록
 
     --- ACTION SCHEMA ---
     {action_schema}
@@ -236,21 +324,37 @@ def get_llm_and_template(_google_api_key, _tools):
     2. 'thought'에 다음 행동 계획을 상세히 서술합니다.
     3. 계획에 가장 적합한 도구와 입력값을 결정합니다.
     4. 만약 모든 정보가 수집되어 최종 답변을 할 수 있다면, 'tool'로 'Final Answer'를 사용합니다.
+    """
+    return llm, structured_llm, static_prefix
 
+
+_DYNAMIC_SUFFIX = """
     --- CONTEXT ---
     이전 대화 기록:
-    {{chat_history}}
+    {chat_history}
 
     이전 행동 및 관찰 기록:
-    {{intermediate_steps}}
+    {intermediate_steps}
 
-    사용자 질문: {{user_query}}
+    사용자 질문: {user_query}
     """
-    prompt_template = ChatPromptTemplate.from_template(template)
-    return llm, structured_llm, prompt_template
+
+
+class ToolCall(BaseModel):
+    tool: Literal[
+        "tavily_search_results_json",
+        "calculator_tool",
+        "wolfram_alpha_tool",
+        "blog_template_tool",
+        "create_study_plan_tool",
+    ] = Field(description="함께 실행할 Tool의 이름")
+
+    tool_input: Any = Field(description="해당 Tool에 전달할 입력값")
 
 
 class Action(BaseModel):
+    model_config = ConfigDict(frozen=True)
+
     thought: str = Field(description="현재 상황 분석과 다음 행동 계획")
 
     tool: Literal[
@@ -265,13 +369,74 @@ class Action(BaseModel):
 
     tool_input: Any = Field(description="선택된 Tool에 전달할 입력값. 문자열 또는 JSON 객체 형태가 될 수 있습니다.")
 
+    parallel_actions: List[ToolCall] = Field(
+        default_factory=list,
+        description="'tool'과 서로 독립적이어서 동시에 실행할 추가 Tool 호출 목록 (예: 웹 검색과 계산을 한 번에)",
+    )
+
+
+# thought는 "Thought:" 줄에 이미 기록되므로 Action 줄에서는 제외합니다.
+_ACTION_STEP_EXCLUDE = {"thought"}
+
+
+@st.cache_resource
+def get_action_adapter() -> TypeAdapter:
+    # 루프마다 Action을 검증/직렬화하므로 어댑터는 리런과 무관하게 한 번만 만들어 재사용합니다.
+    # 검증과 직렬화를 같은 어댑터로 수행해 리런마다 새로 정의되는 Action 클래스와 섞이지 않게 합니다.
+    return TypeAdapter(Action)
+
 
 # --- 3. ReAct 엔진 함수 ---
-def run_structured_react_engine(user_query: str, chat_history: list, _tools, _structured_llm, _prompt_template):
+def _response_cache_key(user_query: str, chat_history) -> tuple:
+    """공백/대소문자만 다른 질문도 같은 키가 되도록 정규화하고, 최근 3턴의 대화 해시를 문맥으로 함께 사용합니다.
+
+    "더 자세히", "계속"처럼 문맥에 따라 답이 달라지는 질문이 다른 문맥에서 만든 답변을 재사용하지 않도록 합니다.
+    """
+    recent_turns = tuple((str(human), str(assistant)) for human, assistant in list(chat_history)[-3:])
+    return " ".join(user_query.split()).casefold(), hash(recent_turns)
+
+
+def _remember_response(cache: collections.OrderedDict, key: tuple, answer: Any) -> None:
+    cache[key] = answer
+    if len(cache) > MAX_CACHED_RESPONSES:
+        cache.popitem(last=False)
+
+
+def _invoke_tool(tool_map: dict, tool_name: str, tool_input: Any) -> Any:
+    if tool_name not in tool_map:
+        return f"오류: '{tool_name}' Tool을 찾을 수 없습니다."
+    try:
+        return tool_map[tool_name].invoke(tool_input)
+    except Exception as e:
+        return f"Tool 실행 중 오류 발생: {str(e)}"
+
+
+def run_structured_react_engine(user_query: str, chat_history: list, _tools, _structured_llm, _static_prefix):
+    # 순수 산술식("2+3*4")은 LLM과 calculator_tool을 왕복하지 않고 바로 계산합니다.
+    if _ARITHMETIC_RE.fullmatch(user_query) and _ARITHMETIC_OPERATOR_RE.search(user_query.strip().lstrip("+-")):
+        try:
+            result = _eval_arithmetic(user_query)
+            with st.sidebar:
+                st.write("⚡ 산술식을 감지하여 LLM 호출 없이 계산했습니다.")
+            return str(result)
+        except Exception:
+            pass  # 계산할 수 없는 식(0으로 나누기 등)은 평소처럼 ReAct 루프에서 처리
+
+    # 이 세션에서 같은 문맥으로 이미 답한 질문이면 저장된 최종 답변을 바로 반환합니다.
+    response_cache = st.session_state.response_cache
+    cache_key = _response_cache_key(user_query, chat_history)
+    if cache_key in response_cache:
+        response_cache.move_to_end(cache_key)
+        with st.sidebar:
+            st.write("♻️ 같은 질문에 대한 이전 답변을 재사용합니다.")
+        return response_cache[cache_key]
+
     tool_map = {tool.name: tool for tool in _tools}
+    action_adapter = get_action_adapter()
 
-    history_str = "\n".join([f"Human: {h[0]}\nAssistant: {h[1]}" for h in chat_history])
-    intermediate_steps_str = ""
+    # 대화 기록은 루프 동안 변하지 않으므로 한 번만 문자열로 만듭니다.
+    history_str = "\n".join(f"Human: {human}\nAssistant: {assistant}" for human, assistant in chat_history)
+    intermediate_steps = []
 
     # 자율적 루프 시작
     for i in range(10):  # 최대 10번의 반복으로 안전장치 설정
@@ -280,26 +445,37 @@ def run_structured_react_engine(user_query: str, chat_history: list, _tools, _st
             st.write(f"🔄 ReAct Loop: Iteration {i+1}")
 
         # 1. 프롬프트 생성
-        prompt = _prompt_template.format(
-            user_query=user_query, chat_history=history_str, intermediate_steps=intermediate_steps_str
+        prompt = _static_prefix + _DYNAMIC_SUFFIX.format(
+            user_query=user_query, chat_history=history_str, intermediate_steps="\n".join(intermediate_steps)
         )
 
-        # 2. instructor를 사용하여 구조화된 응답 생성
+        # 2. instructor를 사용하여 구조화된 응답을 스트리밍으로 생성
         try:
-            response_object = _structured_llm.chat.completions.create(
+            thought_placeholder = st.sidebar.empty()
+            partial_action = None
+            for partial_action in _structured_llm.chat.completions.create_partial(
                 model="gemini-2.5-flash", response_model=Action, messages=[{"role": "user", "content": prompt}]
-            )
+            ):
+                # 사이드바에 Thought를 생성되는 대로 표시
+                if partial_action.thought:
+                    thought_placeholder.write(f"🤔 **Thought:** {partial_action.thought[:1000]}...")
 
-            thought = response_object.thought
-            action_obj = response_object
+            if partial_action is None:
+                return "ReAct 엔진 실행 중 오류가 발생했습니다: LLM 응답이 비어 있습니다."
+
+            # tool_input=None은 정상적인 입력이므로 남기고, 채워지지 않은 parallel_actions만 기본값(빈 목록)에 맡깁니다.
+            action_data = partial_action.model_dump()
+            if action_data.get("parallel_actions") is None:
+                action_data.pop("parallel_actions", None)
+            action_obj = action_adapter.validate_python(action_data)
+            thought = action_obj.thought
 
-            # 사이드바에 Thought 표시
             with st.sidebar:
-                st.write(f"🤔 **Thought:** {thought[:1000]}...")
                 st.write(f"🎬 **Action:** {action_obj.tool}")
 
             # 3. 최종 답변인지 확인
             if action_obj.tool == "Final Answer":
+                _remember_response(response_cache, cache_key, action_obj.tool_input)
                 return action_obj.tool_input
 
             # 4. ask_user_tool 특별 처리
@@ -308,28 +484,33 @@ def run_structured_react_engine(user_query: str, chat_history: list, _tools, _st
                 # 질문을 사용자에게 보여주고 ReAct 루프 중단
                 return f"💬 **질문**: {question}\n\n위 질문에 답변해 주시면, 그 정보를 바탕으로 맞춤형 계획을 세워드리겠습니다!"
 
-            # 5. Tool 실행
-            if action_obj.tool in tool_map:
-                tool_to_use = tool_map[action_obj.tool]
-                tool_input = action_obj.tool_input
+            # 5. Tool 실행 (parallel_actions가 있으면 독립적인 Tool들을 스레드로 동시에 실행)
+            calls = [(action_obj.tool, action_obj.tool_input)]
+            calls += [(call.tool, call.tool_input) for call in action_obj.parallel_actions]
 
-                with st.sidebar.expander(f"🎬 **Action:** {action_obj.tool}", expanded=False):
+            for tool_name, tool_input in calls:
+                with st.sidebar.expander(f"🎬 **Action:** {tool_name}", expanded=False):
                     st.text(f"입력: {tool_input}")
 
-                try:
-                    observation = tool_to_use.invoke(tool_input)
-                    # 사이드바에 관찰 결과 표시
-                    with st.sidebar:
-                        st.write(f"👀 **관찰:** {str(observation)[:1000]}...")
-                except Exception as e:
-                    observation = f"Tool 실행 중 오류 발생: {str(e)}"
+            if len(calls) == 1:
+                observations = [_invoke_tool(tool_map, *calls[0])]
+            else:
+                with ThreadPoolExecutor(max_workers=len(calls)) as executor:
+                    observations = list(executor.map(lambda call: _invoke_tool(tool_map, *call), calls))
+
+            # 사이드바에 관찰 결과 표시 (Streamlit 호출은 메인 스레드에서만 수행)
+            with st.sidebar:
+                for obs in observations:
+                    st.write(f"👀 **관찰:** {str(obs)[:1000]}...")
+
+            if len(calls) == 1:
+                observation = observations[0]
             else:
-                observation = f"오류: '{action_obj.tool}' Tool을 찾을 수 없습니다."
+                observation = "\n".join(f"[{name}] {obs}" for (name, _), obs in zip(calls, observations))
 
             # 5. 다음 루프를 위한 기록 업데이트
-            intermediate_steps_str += (
-                f"\nThought: {thought}\nAction: {action_obj.model_dump_json()}\nObservation: {observation}"
-            )
+            action_json = action_adapter.dump_json(action_obj, exclude=_ACTION_STEP_EXCLUDE).decode()
+            intermediate_steps.append(f"Thought: {thought}\nAction: {action_json}\nObservation: {observation}")
 
         except Exception as e:
             return f"ReAct 엔진 실행 중 오류가 발생했습니다: {str(e)}"
@@ -349,7 +530,7 @@ else:
 
     # 도구와 LLM/템플릿 초기화 (캐시 사용)
     tools = get_tools()
-    llm, structured_llm, prompt_template = get_llm_and_template(google_api_key, tools)
+    llm, structured_llm, static_prefix = get_llm_and_template(google_api_key, tools)
 
     # 대화 기록 표시
     for message in st.session_state.messages:
@@ -370,7 +551,7 @@ else:
                     st.empty()
 
                 response = run_structured_react_engine(
-                    prompt, st.session_state.chat_history, tools, structured_llm, prompt_template
+                    prompt, st.session_state.chat_history, tools, structured_llm, static_prefix
                 )
                 st.markdown(response)
 
@@ -6,10 +6,32 @@ A2A 표준 준수 멀티 에이전트 시스템 데모
 
 import asyncio
 import json
-from typing import Any, Dict
+import re
+from dataclasses import dataclass, field
+from typing import Any, Callable, Dict, Optional
 
 import httpx
 
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:  # orjson이 설치되지 않은 환경에서는 표준 json 모듈 사용
+    _json_loads = json.loads
+
+# 글쓰기 세션에서 입력을 피드백(수정 요청)으로 판단하는 키워드 (한 번의 정규식 스캔으로 검사)
+_FEEDBACK_WORDS = ("수정", "피드백", "개선", "바꿔", "고쳐")
+_FEEDBACK_RE = re.compile("|".join(map(re.escape, _FEEDBACK_WORDS)))
+
+
+@dataclass(slots=True)
+class A2AResult:
+    """A2A 메시지 요청 결과 (성공 시 task, 실패 시 error)"""
+
+    ok: bool
+    task: Dict[str, Any] = field(default_factory=dict)
+    error: str = ""
+
 
 class A2AMultiAgentDemo:
     """A2A 표준 멀티 에이전트 시스템 데모"""
@@ -17,25 +39,41 @@ class A2AMultiAgentDemo:
     def __init__(self):
         self.research_agent_url = "http://localhost:8000"
         self.writing_agent_url = "http://localhost:8001"
+        # 모든 A2A 호출이 하나의 커넥션 풀을 공유하여 매 요청마다 TCP 연결을 새로 맺지 않도록 합니다.
+        self._client = httpx.AsyncClient(
+            timeout=30.0, limits=httpx.Limits(max_keepalive_connections=20, keepalive_expiry=60.0)
+        )
+
+    async def aclose(self):
+        """공유 HTTP 클라이언트를 닫습니다."""
+        await self._client.aclose()
 
     async def get_agent_card(self, agent_url: str) -> Dict[str, Any]:
         """에이전트 카드를 가져옵니다."""
 
-        async with httpx.AsyncClient(timeout=10.0) as client:
-            try:
-                response = await client.get(f"{agent_url}/.well-known/agent-card.json")
-                response.raise_for_status()
-                return response.json()
-            except Exception as e:
-                return {"error": f"Agent Card 가져오기 실패: {e}"}
+        try:
+            response = await self._client.get(f"{agent_url}/.well-known/agent-card.json", timeout=10.0)
+            response.raise_for_status()
+            return _json_loads(response.content)
+        except Exception as e:
+            return {"error": f"Agent Card 가져오기 실패: {e}"}
 
     async def send_a2a_message(
-        self, agent_url: str, message: str, skill: str = "", task_id: str = ""
-    ) -> Dict[str, Any]:
-        """A2A 표준 메시지를 보냅니다."""
+        self,
+        agent_url: str,
+        message: str,
+        skill: str = "",
+        task_id: str = "",
+        on_chunk: Optional[Callable[[str], None]] = None,
+    ) -> A2AResult:
+        """A2A 표준 메시지를 보냅니다.
+
+        on_chunk가 주어지면 message/stream으로 요청하여, 응답 텍스트 조각이 도착하는 대로 on_chunk에 전달합니다.
+        """
 
         # A2A 표준 JSON-RPC 2.0 요청 구성
-        request_data = {"jsonrpc": "2.0", "method": "message/send", "params": {"message": {"text": message}}, "id": 1}
+        method = "message/stream" if on_chunk else "message/send"
+        request_data = {"jsonrpc": "2.0", "method": method, "params": {"message": {"text": message}}, "id": 1}
 
         # 스킬 지정
         if skill:
@@ -46,14 +84,56 @@ class A2AMultiAgentDemo:
             request_data["params"]["taskId"] = task_id
             request_data["params"]["contextId"] = task_id
 
-        async with httpx.AsyncClient(timeout=30.0) as client:
-            try:
-                response = await client.post(agent_url, json=request_data)
+        if on_chunk:
+            return await self._stream_a2a_message(agent_url, request_data, on_chunk)
+
+        try:
+            response = await self._client.post(agent_url, json=request_data)
+            response.raise_for_status()
+            result = _json_loads(response.content)
+        except Exception as e:
+            return A2AResult(ok=False, error=f"A2A 메시지 전송 실패: {e}")
+
+        match result:
+            case {"result": {"task": dict() as task}}:
+                return A2AResult(ok=True, task=task)
+            case {"error": error}:
+                return A2AResult(ok=False, error=f"A2A 오류 응답: {error}")
+            case _:
+                return A2AResult(ok=True)
+
+    async def _stream_a2a_message(
+        self, agent_url: str, request_data: Dict[str, Any], on_chunk: Callable[[str], None]
+    ) -> A2AResult:
+        """SSE 스트림의 각 이벤트(JSON-RPC 응답)를 읽어 텍스트 조각을 전달하고, 최종 태스크를 조립해 반환합니다."""
+
+        task: Dict[str, Any] = {}
+        chunks = []
+        try:
+            async with self._client.stream(
+                "POST", agent_url, json=request_data, headers={"Accept": "text/event-stream"}
+            ) as response:
                 response.raise_for_status()
-                result = response.json()
-                return result.get("result", {})
-            except Exception as e:
-                return {"error": f"A2A 메시지 전송 실패: {e}"}
+                async for line in response.aiter_lines():
+                    if not line.startswith("data:"):
+                        continue
+                    payload = _json_loads(line[len("data:") :])
+                    if "error" in payload:
+                        return A2AResult(ok=False, error=f"A2A 오류 응답: {payload['error']}")
+                    event = payload.get("result", {}).get("task", {})
+                    for artifact in event.pop("artifacts", []):
+                        chunk = artifact.get("content", "")
+                        chunks.append(chunk)
+                        on_chunk(chunk)
+                    task.update(event)
+        except Exception as e:
+            return A2AResult(ok=False, error=f"A2A 스트리밍 실패: {e}")
+
+        task["artifacts"] = [{"type": "text/plain", "content": "".join(chunks)}]
+        status = task.get("status", {})
+        if status.get("state") == "failed":
+            return A2AResult(ok=False, task=task, error=f"A2A 태스크 실패: {status.get('message', '')}")
+        return A2AResult(ok=True, task=task)
 
     async def verify_a2a_compliance(self):
         """A2A 표준 준수 여부를 검증합니다."""
@@ -61,9 +141,13 @@ class A2AMultiAgentDemo:
         print("\n🔍 A2A 표준 준수 여부 검증")
         print("=" * 60)
 
+        # 두 에이전트 카드를 동시에 가져옵니다 (get_agent_card는 예외 대신 error 딕셔너리를 반환)
+        research_card, writing_card = await asyncio.gather(
+            self.get_agent_card(self.research_agent_url), self.get_agent_card(self.writing_agent_url)
+        )
+
         # 연구 에이전트 검증
         print("📚 연구 에이전트 검증:")
-        research_card = await self.get_agent_card(self.research_agent_url)
         if "error" not in research_card:
             print(f"  ✅ Agent Card: {research_card.get('name')} v{research_card.get('version')}")
             print(f"  ✅ URL: {research_card.get('url')}")
@@ -74,7 +158,6 @@ class A2AMultiAgentDemo:
 
         # 글쓰기 에이전트 검증
         print("\n✍️ 글쓰기 에이전트 검증:")
-        writing_card = await self.get_agent_card(self.writing_agent_url)
         if "error" not in writing_card:
             print(f"  ✅ Agent Card: {writing_card.get('name')} v{writing_card.get('version')}")
             print(f"  ✅ URL: {writing_card.get('url')}")
@@ -108,11 +191,11 @@ class A2AMultiAgentDemo:
 
                 research_result = await self.send_a2a_message(self.research_agent_url, user_input, skill="research")
 
-                if "error" in research_result:
-                    print(f"❌ 연구 오류: {research_result['error']}")
+                if not research_result.ok:
+                    print(f"❌ 연구 오류: {research_result.error}")
                     continue
 
-                task = research_result.get("task", {})
+                task = research_result.task
                 artifacts = task.get("artifacts", [])
                 if artifacts:
                     content = artifacts[0].get("content", "")
@@ -150,23 +233,35 @@ class A2AMultiAgentDemo:
 
         current_task_id = None
 
+        # 글쓰기 에이전트가 스트리밍을 지원하면 글이 생성되는 대로 화면에 출력합니다.
+        writing_card = await self.get_agent_card(self.writing_agent_url)
+        on_chunk = _print_chunk if writing_card.get("capabilities", {}).get("streaming") else None
+
         # 연구 내용이 있으면 자동으로 글쓰기 시작
         if research_content:
             writing_prompt = f"주제: {original_topic}\n\n연구 자료:\n{research_content[:1000]}...\n\n위 연구 자료를 바탕으로 체계적인 글을 작성해주세요."
 
             print(f"📝 연구 내용을 바탕으로 글을 작성합니다...")
+            if on_chunk:
+                print(f"\n📄 작성된 글:")
+                print("=" * 80)
 
-            writing_result = await self.send_a2a_message(self.writing_agent_url, writing_prompt, skill="writing")
+            writing_result = await self.send_a2a_message(
+                self.writing_agent_url, writing_prompt, skill="writing", on_chunk=on_chunk
+            )
 
-            if "error" not in writing_result:
-                task = writing_result.get("task", {})
+            if writing_result.ok:
+                task = writing_result.task
                 current_task_id = task.get("id")
                 artifacts = task.get("artifacts", [])
                 if artifacts:
-                    content = artifacts[0].get("content", "")
-                    print(f"\n📄 작성된 글:")
-                    print("=" * 80)
-                    print(content)
+                    if on_chunk:
+                        print()
+                    else:
+                        content = artifacts[0].get("content", "")
+                        print(f"\n📄 작성된 글:")
+                        print("=" * 80)
+                        print(content)
                     print("=" * 80)
 
         print("\n글쓰기 요청이나 피드백을 입력하세요. (종료: 'quit' 또는 'exit')")
@@ -184,34 +279,47 @@ class A2AMultiAgentDemo:
                     continue
 
                 # 피드백인지 새 글쓰기인지 판단
-                if current_task_id and any(
-                    word in user_input.lower() for word in ["수정", "피드백", "개선", "바꿔", "고쳐"]
-                ):
+                if current_task_id and _FEEDBACK_RE.search(user_input):
                     print(f"🔄 피드백 반영 중: {user_input}")
+                    if on_chunk:
+                        print(f"\n📄 결과:")
+                        print("-" * 80)
 
                     result = await self.send_a2a_message(
-                        self.writing_agent_url, f"피드백: {user_input}", skill="revision", task_id=current_task_id
+                        self.writing_agent_url,
+                        f"피드백: {user_input}",
+                        skill="revision",
+                        task_id=current_task_id,
+                        on_chunk=on_chunk,
                     )
                 else:
                     print(f"📝 새 글 작성 중: {user_input}")
+                    if on_chunk:
+                        print(f"\n📄 결과:")
+                        print("-" * 80)
 
-                    result = await self.send_a2a_message(self.writing_agent_url, user_input, skill="writing")
+                    result = await self.send_a2a_message(
+                        self.writing_agent_url, user_input, skill="writing", on_chunk=on_chunk
+                    )
 
                     # 새 태스크 ID 업데이트
-                    if "error" not in result:
-                        current_task_id = result.get("task", {}).get("id")
+                    if result.ok:
+                        current_task_id = result.task.get("id")
 
-                if "error" in result:
-                    print(f"❌ 오류: {result['error']}")
+                if not result.ok:
+                    print(f"❌ 오류: {result.error}")
                     continue
 
-                task = result.get("task", {})
+                task = result.task
                 artifacts = task.get("artifacts", [])
                 if artifacts:
-                    content = artifacts[0].get("content", "")
-                    print(f"\n📄 결과:")
-                    print("-" * 80)
-                    print(content)
+                    if on_chunk:
+                        print()
+                    else:
+                        content = artifacts[0].get("content", "")
+                        print(f"\n📄 결과:")
+                        print("-" * 80)
+                        print(content)
                     print("-" * 80)
                 else:
                     print("❌ 결과를 가져올 수 없습니다")
@@ -221,6 +329,11 @@ class A2AMultiAgentDemo:
                 break
 
 
+def _print_chunk(chunk: str) -> None:
+    """스트리밍으로 도착한 텍스트 조각을 줄바꿈 없이 즉시 출력합니다."""
+    print(chunk, end="", flush=True)
+
+
 async def main():
     """메인 데모 함수"""
 
@@ -255,6 +368,8 @@ async def main():
         print("\n⏹️ 데모 중단됨")
     except Exception as e:
         print(f"❌ 오류 발생: {e}")
+    finally:
+        await demo.aclose()
 
 
 if __name__ == "__main__":
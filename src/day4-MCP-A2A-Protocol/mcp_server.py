@@ -1,14 +1,29 @@
 import os
+from contextlib import asynccontextmanager
 
 from fastapi import Depends, FastAPI, HTTPException
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse
 from pydantic import BaseModel, Field
 
 # --- FastAPI 앱 초기화 ---
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield  # 서버 실행
+    # Shutdown: Rate limit용 Redis 커넥션 풀 정리 (app.state.redis는 아래 Rate limiting 섹션에서 생성)
+    await app.state.redis.aclose()
+
+
+# 응답 직렬화는 표준 json 대신 orjson(C 구현)으로 처리합니다.
 app = FastAPI(
     title="LLM Agent Resource Hub (MCP Server)",
     description="다양한 Agent들이 공유할 수 있는 Tool과 리소스를 제공하는 중앙 MCP 서버입니다.",
     version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
 )
+# 검색 결과(논문 초록, 기사 본문 등)가 큰 응답은 gzip으로 압축합니다. (작은 응답은 그대로, 압축 레벨은 CPU 비용을 고려해 4)
+app.add_middleware(GZipMiddleware, minimum_size=1024, compresslevel=4)
 
 
 # --- 기본 엔드포인트: 서버 상태 확인 ---
@@ -20,10 +35,6 @@ async def read_root():
 
 print("✅ mcp_server.py 파일의 기본 뼈대가 생성되었습니다.")
 
-from typing import Any, Dict
-
-from fastapi import Body
-
 # 방금 만든 Tool 함수들을 import
 from server_tools import arxiv_search, news_api_search, web_search
 
@@ -34,59 +45,65 @@ class ToolCallRequest(BaseModel):
 
 
 # --- Tool 엔드포인트 구현 ---
-@app.post("/tools/web_search", summary="일반 웹 검색 수행", tags=["Tools"])
-async def run_web_search(request: ToolCallRequest):
-    result = await web_search(request.query)
-    return {"tool": "web_search", "query": request.query, "result": result}
+# Tool 이름 -> (함수, 요약). 기본/보안/최종 엔드포인트 모두 이 표에서 생성하므로 Tool 추가 시 한 줄만 늘리면 됩니다.
+TOOLS = {
+    "web_search": (web_search, "일반 웹 검색 수행"),
+    "news_api": (news_api_search, "최신 뉴스 기사 검색"),
+    "arxiv_search": (arxiv_search, "학술 논문 검색"),
+}
+
+
+def make_tool_handler(tool_name: str, tool_func):
+    """Tool 하나를 호출하는 엔드포인트 함수를 만듭니다. (인증/Rate limit은 라우트의 dependencies로 지정)"""
 
+    async def run_tool(data: ToolCallRequest):
+        result = await tool_func(data.query)
+        return {"tool": tool_name, "query": data.query, "result": result}
 
-@app.post("/tools/news_api", summary="최신 뉴스 기사 검색", tags=["Tools"])
-async def run_news_search(request: ToolCallRequest):
-    result = await news_api_search(request.query)
-    return {"tool": "news_api", "query": request.query, "result": result}
+    run_tool.__name__ = f"run_{tool_name}"
+    return run_tool
 
 
-@app.post("/tools/arxiv_search", summary="학술 논문 검색", tags=["Tools"])
-async def run_arxiv_search(request: ToolCallRequest):
-    result = await arxiv_search(request.query)
-    return {"tool": "arxiv_search", "query": request.query, "result": result}
+TOOL_HANDLERS = {tool_name: make_tool_handler(tool_name, tool_func) for tool_name, (tool_func, _) in TOOLS.items()}
+
+for tool_name, (_, summary) in TOOLS.items():
+    app.post(f"/tools/{tool_name}", summary=summary, tags=["Tools"])(TOOL_HANDLERS[tool_name])
 
 
 print("✅ 3개의 Tool 엔드포인트가 mcp_server.py에 추가되었습니다.")
 
-from server_resources import get_style_guide, get_template
+from server_resources import get_style_guide_response, get_template_response
 
 
 # --- 리소스 엔드포인트 구현 ---
+# 없는 ID는 server_resources에서 404 HTTPException을 발생시킵니다.
 @app.get("/resources/templates/{template_id}", summary="블로그 템플릿 조회", tags=["Resources"])
 async def read_template(template_id: str):
-    content = await get_template(template_id)
-    if "error" in content:
-        raise HTTPException(status_code=404, detail=content["error"])
-    return {"resource": "template", "id": template_id, "content": content}
+    return get_template_response(template_id)
 
 
 @app.get("/resources/style_guides/{guide_id}", summary="스타일 가이드 조회", tags=["Resources"])
 async def read_style_guide(guide_id: str):
-    content = await get_style_guide(guide_id)
-    if "error" in content:
-        raise HTTPException(status_code=404, detail=content["error"])
-    return {"resource": "style_guide", "id": guide_id, "content": content}
+    return get_style_guide_response(guide_id)
 
 
 print("✅ 2개의 리소스 엔드포인트가 mcp_server.py에 추가되었습니다.")
 
+import hmac
+
 from fastapi import Request, Security
 from fastapi.security import APIKeyHeader
 
 # --- 보안: API 키 인증 ---
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=True)
+# 마스터 키는 서버 시작 시 한 번만 읽습니다. (설정되지 않았으면 기동 단계에서 바로 실패)
+MASTER_API_KEY = os.environ["MASTER_API_KEY"].encode()
 
 
 async def get_api_key(api_key: str = Security(api_key_header)):
-    """요청 헤더에서 API 키를 가져와 마스터 키와 비교하는 의존성 함수"""
-    if api_key == os.environ["MASTER_API_KEY"]:
+    """요청 헤더에서 API 키를 가져와 마스터 키와 비교하는 의존성 함수 (타이밍 공격을 막기 위해 상수 시간 비교)"""
+    if hmac.compare_digest(api_key.encode(), MASTER_API_KEY):
         return api_key
     else:
         raise HTTPException(
@@ -99,72 +116,167 @@ async def get_api_key(api_key: str = Security(api_key_header)):
 # 새로운 경로로 보안 엔드포인트 생성
 
 
-@app.post("/secure/tools/web_search", summary="일반 웹 검색 수행 (보안)", tags=["Protected Tools"])
-async def secure_web_search(request: ToolCallRequest, api_key: str = Depends(get_api_key)):
-    result = await web_search(request.query)
-    return {"tool": "web_search", "query": request.query, "result": result}
-
-
-@app.post("/secure/tools/news_api", summary="최신 뉴스 기사 검색 (보안)", tags=["Protected Tools"])
-async def secure_news_search(request: ToolCallRequest, api_key: str = Depends(get_api_key)):
-    result = await news_api_search(request.query)
-    return {"tool": "news_api", "query": request.query, "result": result}
-
-
-@app.post("/secure/tools/arxiv_search", summary="학술 논문 검색 (보안)", tags=["Protected Tools"])
-async def secure_arxiv_search(request: ToolCallRequest, api_key: str = Depends(get_api_key)):
-    result = await arxiv_search(request.query)
-    return {"tool": "arxiv_search", "query": request.query, "result": result}
+for tool_name, (_, summary) in TOOLS.items():
+    app.post(
+        f"/secure/tools/{tool_name}",
+        summary=f"{summary} (보안)",
+        tags=["Protected Tools"],
+        dependencies=[Depends(get_api_key)],
+    )(TOOL_HANDLERS[tool_name])
 
 
 @app.get("/secure/resources/templates/{template_id}", summary="블로그 템플릿 조회 (보안)", tags=["Protected Resources"])
 async def secure_read_template(template_id: str, api_key: str = Depends(get_api_key)):
-    content = await get_template(template_id)
-    if isinstance(content, dict) and "error" in content:
-        raise HTTPException(status_code=404, detail=content["error"])
-    return {"resource": "template", "id": template_id, "content": content}
+    return get_template_response(template_id)
 
 
 @app.get("/secure/resources/style_guides/{guide_id}", summary="스타일 가이드 조회 (보안)", tags=["Protected Resources"])
 async def secure_read_style_guide(guide_id: str, api_key: str = Depends(get_api_key)):
-    content = await get_style_guide(guide_id)
-    if isinstance(content, dict) and "error" in content:
-        raise HTTPException(status_code=404, detail=content["error"])
-    return {"resource": "style_guide", "id": guide_id, "content": content}
+    return get_style_guide_response(guide_id)
 
 
 print("✅ 보안 API 키 인증이 적용된 새로운 엔드포인트들이 추가되었습니다.")
 
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
-
-# --- 안정성: 요청 수 제한 ---
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+import math
+
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+
+# --- 안정성: 요청 수 제한 (Redis 토큰 버킷) ---
+# 프로세스 메모리에 카운터를 두면 uvicorn 워커마다 한도가 따로 잡히므로, 모든 워커가 같은 Redis 버킷을 공유합니다.
+# 토큰 충전과 차감은 Lua 스크립트 하나로 원자적으로 처리합니다. (register_script는 EVALSHA로 스크립트를 재사용)
+# ARGV[3]은 이번 요청이 차감할 토큰 수입니다. (배치 요청은 항목 수만큼 차감)
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local cost = tonumber(ARGV[3]) or 1
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "last")
+local tokens = tonumber(bucket[1]) or capacity
+local last = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= cost then
+    tokens = tokens - cost
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "last", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate))
+return allowed
+"""
+
+app.state.redis = Redis.from_url(os.getenv("REDIS_URL", "redis://localhost:6379/0"))
+token_bucket = app.state.redis.register_script(TOKEN_BUCKET_LUA)
+
+
+RATE_LIMIT_CAPACITY = 10
+RATE_LIMIT_PER_SECONDS = 60.0
+
+
+async def consume_rate_limit(
+    request: Request,
+    scope: str,
+    cost: int = 1,
+    capacity: int = RATE_LIMIT_CAPACITY,
+    per_seconds: float = RATE_LIMIT_PER_SECONDS,
+):
+    """클라이언트 IP의 scope 버킷에서 cost개의 토큰을 차감하고, 부족하면 429를 발생시킵니다."""
+    refill_rate = capacity / per_seconds
+    # 클라이언트 주소를 알 수 없는 경우(일부 ASGI 서버/테스트 클라이언트)에는 고정 키 하나를 공유합니다.
+    client_host = request.client.host if request.client else "unknown"
+    key = f"rl:{client_host}:{scope}"
+    try:
+        allowed = await token_bucket(keys=[key], args=[capacity, refill_rate, cost])
+    except RedisError as e:
+        # Redis 장애 시에는 요청을 막지 않고 통과시킵니다. (fail-open)
+        print(f"⚠️ Rate limit 확인 실패 ({key}): {e}")
+        return
+    if not allowed:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Rate limit exceeded: {capacity} per {per_seconds:g} seconds",
+            headers={"Retry-After": str(math.ceil(cost / refill_rate))},
+        )
 
 
-# Rate limiting이 적용된 최종 엔드포인트들
-@app.post("/api/v1/tools/web_search", summary="웹 검색 (최종)", tags=["Production Tools"])
-@limiter.limit("10/minute")
-async def production_web_search(request: Request, data: ToolCallRequest, api_key: str = Depends(get_api_key)):
-    result = await web_search(data.query)
-    return {"tool": "web_search", "query": data.query, "result": result}
+def rate_limit(scope: str, capacity: int = RATE_LIMIT_CAPACITY, per_seconds: float = RATE_LIMIT_PER_SECONDS):
+    """클라이언트 IP별로 per_seconds 동안 capacity번까지 허용하는 의존성을 만듭니다."""
 
+    async def check_rate_limit(request: Request):
+        await consume_rate_limit(request, scope, 1, capacity, per_seconds)
 
-@app.post("/api/v1/tools/news_api", summary="뉴스 검색 (최종)", tags=["Production Tools"])
-@limiter.limit("10/minute")
-async def production_news_search(request: Request, data: ToolCallRequest, api_key: str = Depends(get_api_key)):
-    result = await news_api_search(data.query)
-    return {"tool": "news_api", "query": data.query, "result": result}
+    return check_rate_limit
 
 
-@app.post("/api/v1/tools/arxiv_search", summary="논문 검색 (최종)", tags=["Production Tools"])
-@limiter.limit("10/minute")
-async def production_arxiv_search(request: Request, data: ToolCallRequest, api_key: str = Depends(get_api_key)):
-    result = await arxiv_search(data.query)
-    return {"tool": "arxiv_search", "query": data.query, "result": result}
+# Rate limiting이 적용된 최종 엔드포인트들
+for tool_name, (_, summary) in TOOLS.items():
+    app.post(
+        f"/api/v1/tools/{tool_name}",
+        summary=f"{summary} (최종)",
+        tags=["Production Tools"],
+        # 인증을 먼저 확인하여, 인증되지 않은 요청이 정상 클라이언트의 IP 버킷을 소진하지 못하게 합니다.
+        dependencies=[Depends(get_api_key), Depends(rate_limit(tool_name))],
+    )(TOOL_HANDLERS[tool_name])
+
+
+import asyncio
+from typing import List, Literal
+
+# --- 배치 엔드포인트: 여러 검색어를 한 번의 요청으로 동시에 처리 ---
+# 외부 API(호스트)별 동시 호출 수 상한 (여러 배치 요청이 겹쳐도 이 수를 넘지 않음)
+BATCH_CONCURRENCY = 8
+TOOL_SEMAPHORES = {tool: asyncio.Semaphore(BATCH_CONCURRENCY) for tool in TOOLS}
+
+
+class BatchRequest(BaseModel):
+    tool: Literal["web_search", "news_api", "arxiv_search"] = Field(..., description="실행할 Tool 이름")
+    # 배치는 Tool 버킷에서 항목 수만큼 토큰을 차감하므로 버킷 용량보다 많은 항목은 받지 않습니다.
+    items: List[ToolCallRequest] = Field(
+        ..., max_length=RATE_LIMIT_CAPACITY, description=f"검색어 목록 (최대 {RATE_LIMIT_CAPACITY}개)"
+    )
+
+
+@app.post(
+    "/api/v1/tools/batch",
+    summary="여러 검색어 일괄 처리 (최종)",
+    tags=["Production Tools"],
+    dependencies=[Depends(get_api_key)],
+)
+async def production_batch_search(data: BatchRequest, request: Request):
+    # 개별 엔드포인트와 같은 Tool 버킷을 항목 수만큼 차감하여, 배치로 Tool별 한도를 우회하지 못하게 합니다.
+    await consume_rate_limit(request, data.tool, cost=len(data.items))
+    tool_func = TOOLS[data.tool][0]
+    semaphore = TOOL_SEMAPHORES[data.tool]
+
+    async def run_one(item: ToolCallRequest):
+        async with semaphore:
+            return await tool_func(item.query)
+
+    # 같은 검색어는 server_tools의 캐시/single-flight로 한 번만 외부 API를 호출합니다.
+    results = await asyncio.gather(*(run_one(item) for item in data.items), return_exceptions=True)
+    return {
+        "tool": data.tool,
+        "results": [
+            {"query": item.query, "result": f"오류: {result}" if isinstance(result, Exception) else result}
+            for item, result in zip(data.items, results)
+        ],
+    }
 
 
 print("✅ Rate limiting이 적용된 최종 프로덕션 엔드포인트들이 추가되었습니다.")
+
+
+if __name__ == "__main__":
+    import uvicorn
+
+    # uvloop(이벤트 루프)와 httptools(HTTP 파서)는 C 구현이라 기본 asyncio/h11보다 요청당 오버헤드가 적습니다.
+    # 워커를 여러 개 띄워도 Rate limit은 Redis 토큰 버킷을 공유하므로 전체 한도가 그대로 유지됩니다.
+    uvicorn.run(
+        "mcp_server:app",
+        host="0.0.0.0",
+        port=int(os.getenv("PORT", "8501")),
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WEB_CONCURRENCY", min(os.cpu_count() or 1, 4))),
+    )
@@ -8,6 +8,7 @@ import asyncio
 import uuid
 from typing import Any, Dict, Optional
 
+import httpx
 import litellm
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.apps.jsonrpc import JSONRPCApplication
@@ -16,6 +17,28 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# litellm이 호출마다 새 HTTP 클라이언트를 만들지 않도록 공유 커넥션 풀을 지정합니다. (TLS 연결 재사용)
+litellm.aclient_session = httpx.AsyncClient(
+    timeout=60.0, limits=httpx.Limits(max_keepalive_connections=50, max_connections=100)
+)
+
+# 연구 요청 프롬프트 (모듈 로드 시 한 번만 만들어 두고 요청마다 주제만 채워 넣습니다)
+RESEARCH_PROMPT_TEMPLATE = """
+다음 주제에 대한 체계적인 연구 조사를 수행해주세요:
+
+주제: {topic}
+
+다음 관점들을 포함하여 연구해주세요:
+1. 현재 기술 수준과 발전 현황
+2. 주요 연구 동향 및 트렌드
+3. 핵심 과제와 한계점
+4. 미래 전망과 발전 방향
+5. 사회적 영향과 시사점
+
+각 항목당 2-3개의 구체적인 내용을 제시해주세요.
+한국어로 답변하고, 전문적이면서도 이해하기 쉽게 설명해주세요.
+""".format
+
 
 class ResearchAgentExecutor(AgentExecutor):
     """연구 에이전트 실행기 - A2A 표준 준수"""
@@ -67,21 +90,7 @@ class ResearchAgentExecutor(AgentExecutor):
     async def conduct_research(self, topic: str) -> str:
         """주제에 대한 연구를 수행합니다."""
 
-        research_prompt = f"""
-다음 주제에 대한 체계적인 연구 조사를 수행해주세요:
-
-주제: {topic}
-
-다음 관점들을 포함하여 연구해주세요:
-1. 현재 기술 수준과 발전 현황
-2. 주요 연구 동향 및 트렌드
-3. 핵심 과제와 한계점
-4. 미래 전망과 발전 방향
-5. 사회적 영향과 시사점
-
-각 항목당 2-3개의 구체적인 내용을 제시해주세요.
-한국어로 답변하고, 전문적이면서도 이해하기 쉽게 설명해주세요.
-"""
+        research_prompt = RESEARCH_PROMPT_TEMPLATE(topic=topic)
 
         try:
             response = await litellm.acompletion(
@@ -140,7 +149,10 @@ async def main():
     app = ResearchAgentApp(agent_card=RESEARCH_AGENT_CARD)
 
     # 서버 시작
-    await app.start_server(host="localhost", port=8000)
+    try:
+        await app.start_server(host="localhost", port=8000)
+    finally:
+        await litellm.aclient_session.aclose()
 
 
 if __name__ == "__main__":
@@ -7,13 +7,35 @@ FastMCP를 사용하여 연구 자료를 저장하고 관리하는 MCP 서버를
 import asyncio
 import json
 import os
+import sqlite3
 import uuid
+from collections import Counter, defaultdict
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, FrozenSet, List, Optional, Set
 
 from fastmcp import FastMCP
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, PrivateAttr
+
+try:
+    import orjson
+
+    load_json = orjson.loads
+
+    def dump_json(data: Any) -> str:
+        return orjson.dumps(data).decode()
+
+    def dump_json_bytes(data: Any) -> bytes:
+        return orjson.dumps(data, option=orjson.OPT_INDENT_2 | orjson.OPT_NON_STR_KEYS)
+
+except ImportError:  # orjson이 설치되지 않은 환경에서는 표준 json 모듈 사용
+    load_json = json.loads
+
+    def dump_json(data: Any) -> str:
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+    def dump_json_bytes(data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
 
 
 # 데이터 모델 정의
@@ -31,6 +53,34 @@ class ResearchMaterial(BaseModel):
     author: Optional[str] = Field(None, description="저자")
     metadata: Dict[str, Any] = Field(default_factory=dict, description="추가 메타데이터")
 
+    # 조회용 직렬화 결과 (생성/수정 시 refresh_cache()로 갱신하여 요청마다 model_dump하지 않음)
+    _cached_summary: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    _cached_full: Dict[str, Any] = PrivateAttr(default_factory=dict)
+    # 검색용 casefold 필드와 미리보기 (검색할 때마다 긴 내용을 변환/슬라이싱하지 않음)
+    # casefold는 lower()보다 유니코드 대소문자 비교에 정확합니다. (예: 'ß' == 'SS')
+    _title_cf: str = PrivateAttr("")
+    _content_cf: str = PrivateAttr("")
+    _category_cf: str = PrivateAttr("")
+    _tags_cf: FrozenSet[str] = PrivateAttr(frozenset())
+    _content_preview: str = PrivateAttr("")
+    _word_count: int = PrivateAttr(0)
+
+    def model_post_init(self, __context: Any) -> None:
+        self.refresh_cache()
+
+    def refresh_cache(self):
+        """목록용 요약, 상세 조회용 전체 직렬화 결과와 검색용 필드를 다시 계산합니다."""
+        self._cached_full = self.model_dump(mode="json")
+        self._cached_summary = {
+            key: self._cached_full[key] for key in ("id", "title", "category", "tags", "created_at", "author")
+        }
+        self._title_cf = self.title.casefold()
+        self._content_cf = self.content.casefold()
+        self._category_cf = self.category.casefold()
+        self._tags_cf = frozenset(tag.casefold() for tag in self.tags)
+        self._content_preview = self.content[:200] + "..." if len(self.content) > 200 else self.content
+        self._word_count = len(self.content.split())
+
 
 # MCP 서버 생성
 research_server = FastMCP(
@@ -41,52 +91,221 @@ research_server = FastMCP(
 # 데이터 저장 경로
 DATA_DIR = Path(__file__).parent / "research_data"
 DATA_DIR.mkdir(exist_ok=True)
-MATERIALS_FILE = DATA_DIR / "materials.json"
+MATERIALS_DB = DATA_DIR / "materials.db"
+# 이전 버전에서 사용하던 JSON 파일 (DB가 비어 있을 때 한 번만 가져옵니다)
+LEGACY_MATERIALS_FILE = DATA_DIR / "materials.json"
 
+MATERIAL_COLUMNS = (
+    "id, title, content, category, tags_json, source_url, created_at, updated_at, author, metadata_json"
+)
 
-def load_materials() -> Dict[str, ResearchMaterial]:
-    """저장된 연구 자료들을 로드합니다."""
-    if not MATERIALS_FILE.exists():
-        return {}
 
+def connect_db() -> sqlite3.Connection:
+    """연구 자료 DB에 연결합니다.
+
+    변경 시마다 전체 JSON 파일을 다시 쓰는 대신, 자료 한 건 단위로 INSERT/UPDATE/DELETE 합니다.
+    WAL 모드 + synchronous=NORMAL로 쓰기마다 fsync하지 않아도 데이터가 손상되지 않습니다.
+    """
+    conn = sqlite3.connect(MATERIALS_DB, isolation_level=None, check_same_thread=False)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(
+        """
+        CREATE TABLE IF NOT EXISTS materials (
+            id TEXT PRIMARY KEY,
+            title TEXT NOT NULL,
+            content TEXT NOT NULL,
+            category TEXT NOT NULL,
+            tags_json TEXT NOT NULL,
+            source_url TEXT,
+            created_at TEXT NOT NULL,
+            updated_at TEXT NOT NULL,
+            author TEXT,
+            metadata_json TEXT NOT NULL
+        )
+        """
+    )
+    return conn
+
+
+def material_to_row(material: ResearchMaterial) -> tuple:
+    return (
+        material.id,
+        material.title,
+        material.content,
+        material.category,
+        dump_json(material.tags),
+        material.source_url,
+        material.created_at.isoformat(),
+        material.updated_at.isoformat(),
+        material.author,
+        dump_json(material.metadata),
+    )
+
+
+def row_to_material(row: tuple) -> ResearchMaterial:
+    material_id, title, content, category, tags_json, source_url, created_at, updated_at, author, metadata_json = row
+    return ResearchMaterial(
+        id=material_id,
+        title=title,
+        content=content,
+        category=category,
+        tags=load_json(tags_json),
+        source_url=source_url,
+        created_at=created_at,
+        updated_at=updated_at,
+        author=author,
+        metadata=load_json(metadata_json),
+    )
+
+
+def load_materials() -> Dict[str, ResearchMaterial]:
+    """저장된 연구 자료들을 로드합니다. (서버 시작 시 한 번만 호출)"""
     try:
-        with open(MATERIALS_FILE, "r", encoding="utf-8") as f:
-            data = json.load(f)
-            return {material_id: ResearchMaterial(**material_data) for material_id, material_data in data.items()}
+        rows = db.execute(f"SELECT {MATERIAL_COLUMNS} FROM materials").fetchall()
+        if not rows and LEGACY_MATERIALS_FILE.exists():
+            return import_legacy_materials()
+        return {row[0]: row_to_material(row) for row in rows}
     except Exception as e:
         print(f"자료 로드 오류: {e}")
         return {}
 
 
-def save_materials(materials: Dict[str, ResearchMaterial]):
-    """연구 자료들을 저장합니다."""
+def import_legacy_materials() -> Dict[str, ResearchMaterial]:
+    """기존 materials.json 파일의 자료를 DB로 옮깁니다."""
+    data = load_json(LEGACY_MATERIALS_FILE.read_bytes())
+    materials = {material_id: ResearchMaterial(**material_data) for material_id, material_data in data.items()}
+    with db:
+        db.execute("BEGIN")
+        db.executemany(
+            f"INSERT OR REPLACE INTO materials ({MATERIAL_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            [material_to_row(material) for material in materials.values()],
+        )
+    return materials
+
+
+def insert_material(material: ResearchMaterial):
+    """연구 자료 한 건을 추가합니다."""
+    try:
+        db.execute(
+            f"INSERT INTO materials ({MATERIAL_COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            material_to_row(material),
+        )
+    except Exception as e:
+        print(f"자료 저장 오류: {e}")
+
+
+def update_material(material: ResearchMaterial):
+    """연구 자료 한 건을 수정합니다."""
+    row = material_to_row(material)
     try:
-        data = {material_id: material.dict() for material_id, material in materials.items()}
-        with open(MATERIALS_FILE, "w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2, default=str)
+        db.execute(
+            """
+            UPDATE materials
+            SET title = ?, content = ?, category = ?, tags_json = ?, source_url = ?,
+                created_at = ?, updated_at = ?, author = ?, metadata_json = ?
+            WHERE id = ?
+            """,
+            row[1:] + row[:1],
+        )
     except Exception as e:
         print(f"자료 저장 오류: {e}")
 
 
-# 전역 자료 저장소
+def delete_material(material_id: str):
+    """연구 자료 한 건을 삭제합니다."""
+    try:
+        db.execute("DELETE FROM materials WHERE id = ?", (material_id,))
+    except Exception as e:
+        print(f"자료 삭제 오류: {e}")
+
+
+# 전역 자료 저장소 (시작 시 DB에서 한 번 읽어 메모리에 유지)
+db = connect_db()
 materials_store = load_materials()
 
+# 검색용 역색인 (casefold 키 -> 자료 ID 집합). 자료를 쓸 때 갱신하여 조회 시 전체 자료를 훑지 않습니다.
+# 본문 검색은 부분 문자열 일치이므로 단어 대신 글자 n-gram으로 색인합니다.
+# ("인공지능은"처럼 조사가 붙은 한국어 단어도 "인공지능" 검색에 걸리도록)
+NGRAM_SIZE = 2
+category_index: Dict[str, Set[str]] = defaultdict(set)
+tag_index: Dict[str, Set[str]] = defaultdict(set)
+ngram_index: Dict[str, Set[str]] = defaultdict(set)
+
+# 통계용 누적 카운터 (색인과 함께 갱신하여 get_research_statistics가 전체 자료를 훑지 않음)
+category_counter: Counter = Counter()
+tag_counter: Counter = Counter()
+author_counter: Counter = Counter()
+total_words = 0
+
+
+def text_ngrams(text: str) -> Set[str]:
+    """문자열에 등장하는 길이 NGRAM_SIZE의 글자 n-gram들을 반환합니다."""
+    return {text[i : i + NGRAM_SIZE] for i in range(len(text) - NGRAM_SIZE + 1)}
+
+
+def material_ngrams(material: ResearchMaterial) -> Set[str]:
+    """제목, 내용, 태그, 카테고리(casefold)에 등장하는 글자 n-gram들을 반환합니다."""
+    ngrams: Set[str] = set()
+    for text in (material._title_cf, material._content_cf, material._category_cf, *material._tags_cf):
+        ngrams |= text_ngrams(text)
+    return ngrams
+
+
+def update_statistics(material: ResearchMaterial, delta: int):
+    """자료 하나만큼 통계 카운터를 더하거나(delta=1) 뺍니다(delta=-1). 0 이하가 된 항목은 제거합니다."""
+    global total_words
+    counts = [(category_counter, material.category)]
+    counts += [(tag_counter, tag) for tag in material.tags]
+    if material.author:
+        counts.append((author_counter, material.author))
+    for counter, key in counts:
+        counter[key] += delta
+        if counter[key] <= 0:
+            del counter[key]
+    total_words += delta * material._word_count
+
+
+def index_material(material: ResearchMaterial):
+    """자료를 역색인과 통계에 추가합니다."""
+    update_statistics(material, 1)
+    category_index[material._category_cf].add(material.id)
+    for tag in material._tags_cf:
+        tag_index[tag].add(material.id)
+    for ngram in material_ngrams(material):
+        ngram_index[ngram].add(material.id)
+
+
+def unindex_material(material: ResearchMaterial):
+    """자료를 역색인과 통계에서 제거합니다. (빈 항목은 삭제)
+
+    검색용 필드는 refresh_cache() 전까지 이전 값을 유지하므로, 수정 전에 호출하면 이전 색인 항목이 제거됩니다.
+    """
+    update_statistics(material, -1)
+    entries = [(category_index, material._category_cf)]
+    entries += [(tag_index, tag) for tag in material._tags_cf]
+    entries += [(ngram_index, ngram) for ngram in material_ngrams(material)]
+    for index, key in entries:
+        ids = index.get(key)
+        if ids is not None:
+            ids.discard(material.id)
+            if not ids:
+                del index[key]
+
+
+for _material in materials_store.values():
+    index_material(_material)
+
+
+def ordered_materials(material_ids) -> List[ResearchMaterial]:
+    """색인(집합)에서 꺼낸 ID들을 생성 순서대로 정렬한 자료 목록으로 돌려줍니다. (집합 순회 순서에 결과가 흔들리지 않도록)"""
+    return sorted((materials_store[material_id] for material_id in material_ids), key=lambda m: m.created_at)
+
 
 @research_server.resource("research://materials", description="저장된 모든 연구 자료 목록")
 async def list_all_materials():
     """저장된 모든 연구 자료의 목록을 반환합니다."""
-    materials_list = []
-    for material in materials_store.values():
-        materials_list.append(
-            {
-                "id": material.id,
-                "title": material.title,
-                "category": material.category,
-                "tags": material.tags,
-                "created_at": material.created_at.isoformat(),
-                "author": material.author,
-            }
-        )
+    materials_list = [material._cached_summary for material in materials_store.values()]
 
     return {
         "total_count": len(materials_list),
@@ -102,7 +321,7 @@ async def get_material(material_id: str):
 
     material = materials_store[material_id]
     return {
-        "material": material.dict(),
+        "material": material._cached_full,
         "word_count": len(material.content.split()),
         "character_count": len(material.content),
     }
@@ -111,87 +330,70 @@ async def get_material(material_id: str):
 @research_server.resource("research://materials/category/{category}", description="특정 카테고리의 연구 자료 목록")
 async def get_materials_by_category(category: str):
     """특정 카테고리의 연구 자료들을 반환합니다."""
-    category_materials = [
-        material for material in materials_store.values() if material.category.lower() == category.lower()
-    ]
+    category_materials = ordered_materials(category_index.get(category.casefold(), ()))
 
     return {
         "category": category,
         "count": len(category_materials),
-        "materials": [
-            {
-                "id": material.id,
-                "title": material.title,
-                "tags": material.tags,
-                "created_at": material.created_at.isoformat(),
-                "author": material.author,
-            }
-            for material in category_materials
-        ],
+        "materials": [material._cached_summary for material in category_materials],
     }
 
 
 @research_server.resource("research://materials/tag/{tag}", description="특정 태그가 포함된 연구 자료 목록")
 async def get_materials_by_tag(tag: str):
     """특정 태그가 포함된 연구 자료들을 반환합니다."""
-    tag_materials = [
-        material for material in materials_store.values() if tag.lower() in [t.lower() for t in material.tags]
-    ]
+    tag_materials = ordered_materials(tag_index.get(tag.casefold(), ()))
 
     return {
         "tag": tag,
         "count": len(tag_materials),
-        "materials": [
-            {
-                "id": material.id,
-                "title": material.title,
-                "category": material.category,
-                "created_at": material.created_at.isoformat(),
-                "author": material.author,
-            }
-            for material in tag_materials
-        ],
+        "materials": [material._cached_summary for material in tag_materials],
     }
 
 
 @research_server.resource("research://materials/search/{query}", description="키워드 검색 결과")
 async def search_materials(query: str):
-    """제목, 내용, 태그에서 키워드를 검색합니다."""
-    query_lower = query.lower()
+    """제목, 내용, 태그에서 키워드를 검색합니다.
+
+    검색어의 모든 글자 n-gram이 등장하는 자료만 역색인으로 추린 뒤, 그 후보들에 대해서만 부분 문자열 일치와
+    관련도를 계산합니다. n-gram보다 짧은 검색어는 모든 자료를 후보로 삼습니다.
+    """
+    query_cf = query.casefold()
     search_results = []
 
-    for material in materials_store.values():
+    query_ngrams = text_ngrams(query_cf)
+    if query_ngrams:
+        posting_lists = sorted((ngram_index.get(ngram, set()) for ngram in query_ngrams), key=len)
+        candidate_ids = set(posting_lists[0]).intersection(*posting_lists[1:])
+    else:
+        candidate_ids = set(materials_store)
+
+    # 후보를 생성 순서로 순회하므로 관련도가 같은 자료는 (안정 정렬에 의해) 생성 순서를 유지합니다.
+    for material in ordered_materials(candidate_ids):
         relevance_score = 0
 
         # 제목 검색
-        if query_lower in material.title.lower():
+        if query_cf in material._title_cf:
             relevance_score += 10
 
         # 내용 검색
-        if query_lower in material.content.lower():
+        if query_cf in material._content_cf:
             relevance_score += 5
 
         # 태그 검색
-        if any(query_lower in tag.lower() for tag in material.tags):
+        if any(query_cf in tag for tag in material._tags_cf):
             relevance_score += 8
 
         # 카테고리 검색
-        if query_lower in material.category.lower():
+        if query_cf in material._category_cf:
             relevance_score += 6
 
         if relevance_score > 0:
             search_results.append(
                 {
-                    "material": {
-                        "id": material.id,
-                        "title": material.title,
-                        "category": material.category,
-                        "tags": material.tags,
-                        "created_at": material.created_at.isoformat(),
-                        "author": material.author,
-                    },
+                    "material": material._cached_summary,
                     "relevance_score": relevance_score,
-                    "preview": material.content[:200] + "..." if len(material.content) > 200 else material.content,
+                    "preview": material._content_preview,
                 }
             )
 
@@ -216,7 +418,8 @@ async def create_research_material(
     )
 
     materials_store[material_id] = material
-    save_materials(materials_store)
+    index_material(material)
+    insert_material(material)
 
     return f"연구 자료가 성공적으로 생성되었습니다. ID: {material_id}"
 
@@ -236,6 +439,7 @@ async def update_research_material(
         return f"오류: 연구 자료를 찾을 수 없습니다. ID: {material_id}"
 
     material = materials_store[material_id]
+    unindex_material(material)
 
     # 제공된 값들만 업데이트
     if title is not None:
@@ -252,8 +456,10 @@ async def update_research_material(
         material.author = author
 
     material.updated_at = datetime.now()
+    material.refresh_cache()
 
-    save_materials(materials_store)
+    index_material(material)
+    update_material(material)
 
     return f"연구 자료가 성공적으로 수정되었습니다. ID: {material_id}"
 
@@ -265,44 +471,26 @@ async def delete_research_material(material_id: str) -> str:
         return f"오류: 연구 자료를 찾을 수 없습니다. ID: {material_id}"
 
     deleted_material = materials_store.pop(material_id)
-    save_materials(materials_store)
+    unindex_material(deleted_material)
+    delete_material(material_id)
 
     return f"연구 자료가 성공적으로 삭제되었습니다. 제목: {deleted_material.title}"
 
 
 @research_server.tool(name="get_research_statistics", description="연구 자료에 대한 통계를 제공합니다.")
 async def get_research_statistics() -> Dict[str, Any]:
-    """연구 자료에 대한 통계를 계산하여 반환합니다."""
+    """연구 자료에 대한 통계를 반환합니다. (자료 생성/수정/삭제 시 누적해 둔 카운터를 읽기만 합니다)"""
     if not materials_store:
         return {"message": "저장된 연구 자료가 없습니다."}
 
     total_materials = len(materials_store)
-    categories = {}
-    tags = {}
-    authors = {}
-    total_words = 0
-
-    for material in materials_store.values():
-        # 카테고리별 통계
-        categories[material.category] = categories.get(material.category, 0) + 1
-
-        # 태그별 통계
-        for tag in material.tags:
-            tags[tag] = tags.get(tag, 0) + 1
-
-        # 저자별 통계
-        if material.author:
-            authors[material.author] = authors.get(material.author, 0) + 1
-
-        # 총 단어 수
-        total_words += len(material.content.split())
 
     return {
         "total_materials": total_materials,
         "total_words": total_words,
-        "categories": categories,
-        "top_tags": sorted(tags.items(), key=lambda x: x[1], reverse=True)[:10],
-        "authors": authors,
+        "categories": dict(category_counter),
+        "top_tags": tag_counter.most_common(10),
+        "authors": dict(author_counter),
         "average_words_per_material": total_words / total_materials if total_materials > 0 else 0,
     }
 
@@ -318,20 +506,19 @@ async def export_research_materials(category: str = None, format: str = "json")
     if category:
         # 특정 카테고리만 내보내기
         export_data = {
-            material_id: material.dict()
-            for material_id, material in materials_store.items()
-            if material.category.lower() == category.lower()
+            material_id: materials_store[material_id]._cached_full
+            for material_id in category_index.get(category.casefold(), ())
         }
     else:
         # 모든 자료 내보내기
-        export_data = {material_id: material.dict() for material_id, material in materials_store.items()}
+        export_data = {material_id: material._cached_full for material_id, material in materials_store.items()}
 
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
     filename = f"research_export_{timestamp}.json"
 
     export_path = DATA_DIR / filename
-    with open(export_path, "w", encoding="utf-8") as f:
-        json.dump(export_data, f, ensure_ascii=False, indent=2, default=str)
+    with open(export_path, "wb") as f:
+        f.write(dump_json_bytes(export_data))
 
     return f"연구 자료가 성공적으로 내보내졌습니다. 파일: {filename}, 자료 수: {len(export_data)}"
 
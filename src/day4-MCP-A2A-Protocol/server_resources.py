@@ -1,3 +1,5 @@
+from fastapi import HTTPException
+
 BLOG_TEMPLATES = {
     "tech_analysis": "## 제목\n\n### 1. 기술 개요\n\n### 2. 핵심 작동 원리...",
     "product_review": "## 제목\n\n### 1. 첫인상 및 디자인\n\n### 2. 주요 기능...",
@@ -9,17 +11,33 @@ STYLE_GUIDES = {
 }
 
 
-async def get_template(template_id: str):
-    template = BLOG_TEMPLATES.get(template_id)
-    if template:
-        return template
-    else:
-        return {"error": "Template not found"}
+# 리소스는 고정값이므로 엔드포인트 응답을 미리 만들어 두고 그대로 반환합니다.
+TEMPLATE_RESPONSES = {
+    template_id: {"resource": "template", "id": template_id, "content": template}
+    for template_id, template in BLOG_TEMPLATES.items()
+}
+STYLE_GUIDE_RESPONSES = {
+    guide_id: {"resource": "style_guide", "id": guide_id, "content": guide} for guide_id, guide in STYLE_GUIDES.items()
+}
+
+
+def get_template(template_id: str) -> str:
+    return get_template_response(template_id)["content"]
+
+
+def get_style_guide(guide_id: str) -> str:
+    return get_style_guide_response(guide_id)["content"]
+
+
+def get_template_response(template_id: str) -> dict:
+    try:
+        return TEMPLATE_RESPONSES[template_id]
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Template not found") from None
 
 
-async def get_style_guide(guide_id: str):
-    guide = STYLE_GUIDES.get(guide_id)
-    if guide:
-        return guide
-    else:
-        return {"error": "Style guide not found"}
+def get_style_guide_response(guide_id: str) -> dict:
+    try:
+        return STYLE_GUIDE_RESPONSES[guide_id]
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Style guide not found") from None
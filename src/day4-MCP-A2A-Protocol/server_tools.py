@@ -1,56 +1,141 @@
+import asyncio
+import functools
 import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Tuple, Union
 
 import arxiv
+import requests
 from newsapi import NewsApiClient
-from tavily import TavilyClient
+from tavily import AsyncTavilyClient
+
+
+# --- 공유 클라이언트 ---
+# 요청마다 클라이언트(와 내부 HTTP 세션)를 새로 만들면 매번 TCP/TLS 연결을 다시 맺어야 하므로,
+# 첫 호출 시 한 번만 생성하여 재사용합니다. API 키가 없으면 생성 시 KeyError가 발생해 각 Tool의 오류로 전달됩니다.
+@functools.lru_cache(maxsize=1)
+def get_tavily_client() -> AsyncTavilyClient:
+    return AsyncTavilyClient(api_key=os.environ["TAVILY_API_KEY"])
+
+
+@functools.lru_cache(maxsize=1)
+def get_news_client() -> NewsApiClient:
+    return NewsApiClient(api_key=os.environ["NEWS_API_KEY"], session=requests.Session())
+
+
+@functools.lru_cache(maxsize=1)
+def get_arxiv_client() -> arxiv.Client:
+    return arxiv.Client()
+
+
+# 각 Tool은 검색 결과(dict 리스트)를 그대로 반환하고, FastAPI가 JSON으로 직렬화합니다. 실패 시에는 오류 메시지 문자열을 반환합니다.
+SearchResults = List[Dict[str, Any]]
+
+
+# --- 검색 결과 캐시 ---
+def async_cache(ttl: float = 300, maxsize: int = 1024):
+    """같은 검색어에 대한 결과를 ttl초 동안 메모리에 보관하는 데코레이터 (maxsize 초과 시 가장 오래 안 쓴 항목부터 제거).
+
+    캐시에 없는 검색어가 이미 조회 중이면 새로 요청하지 않고 진행 중인 호출의 결과를 함께 기다립니다. (single-flight)
+    예외가 발생한 호출은 캐시하지 않으므로, 일시적인 API 오류가 ttl 동안 재사용되지 않습니다.
+    """
+
+    def decorator(func: Callable[[str], Awaitable[Any]]) -> Callable[[str], Awaitable[Any]]:
+        cache: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        inflight: Dict[str, asyncio.Task] = {}
+
+        def on_done(key: str, task: asyncio.Task):
+            del inflight[key]
+            if task.cancelled() or task.exception() is not None:
+                return
+            cache[key] = (time.monotonic(), task.result())
+            cache.move_to_end(key)
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+
+        @functools.wraps(func)
+        async def wrapper(query: str) -> Any:
+            key = query.strip().lower()
+            entry = cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                cache.move_to_end(key)
+                return entry[1]
+
+            task = inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(func(query))
+                inflight[key] = task
+                task.add_done_callback(functools.partial(on_done, key))
+            # 한 호출자가 취소되어도 같은 결과를 기다리는 다른 호출자에게는 영향이 없도록 shield 합니다.
+            return await asyncio.shield(task)
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
 
 
 # --- 1. 웹 검색 (Tavily) ---
-async def web_search(query: str) -> str:
+async def web_search(query: str) -> Union[SearchResults, str]:
     try:
-        client = TavilyClient(api_key=os.environ["TAVILY_API_KEY"])
-        response = client.search(query=query, max_results=3, search_depth="advanced")
-        return str(
-            [{"title": obj["title"], "url": obj["url"], "content": obj["content"]} for obj in response["results"]]
-        )
+        return await _web_search(query)
     except Exception as e:
         return f"Tavily API 오류: {e}"
 
 
+@async_cache()
+async def _web_search(query: str) -> SearchResults:
+    response = await get_tavily_client().search(query=query, max_results=3, search_depth="advanced")
+    return [{"title": obj["title"], "url": obj["url"], "content": obj["content"]} for obj in response["results"]]
+
+
 # --- 2. 뉴스 기사 검색 (NewsAPI) ---
-async def news_api_search(query: str) -> str:
+class NewsApiStatusError(Exception):
+    """NewsAPI가 status != "ok" 응답을 돌려준 경우"""
+
+
+async def news_api_search(query: str) -> Union[SearchResults, str]:
     try:
-        client = NewsApiClient(api_key=os.environ["NEWS_API_KEY"])
-        response = client.get_everything(q=query, language="ko", sort_by="relevancy", page_size=3)
-        if response["status"] == "ok":
-            return str(
-                [
-                    {"title": article["title"], "url": article["url"], "description": article["description"]}
-                    for article in response["articles"]
-                ]
-            )
-        else:
-            return f"News API 오류: {response.get('message', 'Unknown error')}"
+        return await _news_api_search(query)
+    except NewsApiStatusError as e:
+        return f"News API 오류: {e}"
     except Exception as e:
         return f"News API 클라이언트 오류: {e}"
 
 
+@async_cache()
+async def _news_api_search(query: str) -> SearchResults:
+    # newsapi-python은 동기(requests) 클라이언트이므로 스레드에서 실행해 이벤트 루프를 막지 않습니다.
+    response = await asyncio.to_thread(
+        get_news_client().get_everything, q=query, language="ko", sort_by="relevancy", page_size=3
+    )
+    if response["status"] != "ok":
+        raise NewsApiStatusError(response.get("message", "Unknown error"))
+    return [
+        {"title": article["title"], "url": article["url"], "description": article["description"]}
+        for article in response["articles"]
+    ]
+
+
 # --- 3. 학술 논문 검색 (Arxiv) ---
-async def arxiv_search(query: str) -> str:
+async def arxiv_search(query: str) -> Union[SearchResults, str]:
     try:
-        client = arxiv.Client()
-        search = arxiv.Search(query=query, max_results=2, sort_by=arxiv.SortCriterion.Relevance)
-        results = list(client.results(search))
-        return str(
-            [
-                {
-                    "title": result.title,
-                    "authors": [str(a) for a in result.authors],
-                    "summary": result.summary,
-                    "pdf_url": result.pdf_url,
-                }
-                for result in results
-            ]
-        )
+        return await _arxiv_search(query)
     except Exception as e:
         return f"Arxiv 검색 오류: {e}"
+
+
+@async_cache()
+async def _arxiv_search(query: str) -> SearchResults:
+    search = arxiv.Search(query=query, max_results=2, sort_by=arxiv.SortCriterion.Relevance)
+    results = await asyncio.to_thread(lambda: list(get_arxiv_client().results(search)))
+    return [
+        {
+            "title": result.title,
+            "authors": [str(a) for a in result.authors],
+            "summary": result.summary,
+            "pdf_url": result.pdf_url,
+        }
+        for result in results
+    ]
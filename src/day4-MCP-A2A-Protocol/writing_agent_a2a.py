@@ -5,17 +5,186 @@ A2A SDK를 사용한 글쓰기 에이전트
 """
 
 import asyncio
+import hashlib
+import json
+import os
+import random
+import time
 import uuid
-from typing import Any, Dict, Optional
+from collections import OrderedDict
+from contextlib import aclosing
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 
 import litellm
 from a2a.server.agent_execution import AgentExecutor, RequestContext
 from a2a.server.apps.jsonrpc import JSONRPCApplication
 from a2a.types import AgentCard, AgentSkill
 from dotenv import load_dotenv
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response, StreamingResponse
 
 load_dotenv()
 
+# --- 프롬프트 ---
+# 고정된 지시문은 system 메시지로 한 번만 만들어 두고, 요청마다 user 메시지만 새로 만듭니다.
+# (매 요청 앞부분이 동일하므로 OpenAI의 프롬프트 캐싱도 적용됩니다)
+WRITING_SYS = """사용자가 요청한 주제에 대한 체계적인 글을 작성해주세요.
+
+다음 구조로 작성해주세요:
+1. 서론 (문제 제기, 글의 목적)
+2. 본론 (주요 내용, 논점들)
+3. 결론 (요약 및 시사점)
+
+약 1000-1500자 정도로 작성해주세요.
+한국어로 작성하고, 체계적이고 논리적으로 구성해주세요."""
+
+FEEDBACK_SYS = """사용자로부터 글에 대한 피드백을 받았습니다.
+
+이 피드백을 반영하여 글을 개선하는 방안을 제시해주세요.
+구체적인 수정 사항과 개선 방향을 설명해주세요.
+가능하면 수정된 부분을 포함하여 답변해주세요."""
+
+WRITING_SYSTEM_MESSAGE = {"role": "system", "content": WRITING_SYS}
+FEEDBACK_SYSTEM_MESSAGE = {"role": "system", "content": FEEDBACK_SYS}
+
+# --- LLM 라우터 ---
+# 모든 글쓰기 호출은 "writer" 모델 그룹으로 보내고, Router가 배포별 RPM/TPM 사용량을 추적해 분산합니다.
+# 연속으로 실패한 배포는 cooldown_time 동안 제외되고, writer 그룹 전체가 실패하면 writer-fallback 그룹으로 넘어갑니다.
+WRITER_MODEL = "writer"
+ROUTER = litellm.Router(
+    model_list=[
+        {
+            "model_name": WRITER_MODEL,
+            "litellm_params": {
+                "model": "openai/gpt-4o-mini",
+                "rpm": 5000,
+                "tpm": 800000,
+                "max_parallel_requests": 30,
+            },
+        },
+        {
+            "model_name": "writer-fallback",
+            "litellm_params": {"model": os.getenv("WRITER_FALLBACK_MODEL", "openai/gpt-4o")},
+        },
+    ],
+    fallbacks=[{WRITER_MODEL: ["writer-fallback"]}],
+    routing_strategy="usage-based-routing-v2",
+    allowed_fails=3,
+    cooldown_time=30,
+    timeout=120,
+    num_retries=0,  # 재시도는 아래 acompletion_guarded의 백오프가 담당
+)
+
+# --- LLM 호출 제어 ---
+# 동시에 LLM API로 나가는 요청 수를 제한하고, Rate limit(429)/연결 오류는 지수 백오프(1, 2, 4초 + 지터)로 재시도합니다.
+LLM_INFLIGHT_LIMIT = int(os.getenv("LLM_INFLIGHT_LIMIT", "20"))
+LLM_MAX_ATTEMPTS = 4
+RETRYABLE_LLM_ERRORS = (litellm.RateLimitError, litellm.APIConnectionError)
+_llm_semaphore = asyncio.Semaphore(LLM_INFLIGHT_LIMIT)
+
+# JSON-RPC 배치 요청 하나에 담을 수 있는 최대 요청 수
+JSONRPC_BATCH_LIMIT = 100
+
+
+async def acompletion_guarded(**kwargs):
+    """ROUTER.acompletion을 동시 실행 수 제한과 재시도를 적용하여 호출합니다.
+
+    백오프 대기 중에는 슬롯을 반납하여 다른 요청이 LLM을 호출할 수 있게 합니다.
+    """
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        async with _llm_semaphore:
+            try:
+                return await ROUTER.acompletion(**kwargs)
+            except RETRYABLE_LLM_ERRORS:
+                if attempt == LLM_MAX_ATTEMPTS - 1:
+                    raise
+        await asyncio.sleep(2**attempt + random.random())
+
+
+async def astream_guarded(**kwargs) -> AsyncIterator[Any]:
+    """ROUTER.acompletion(stream=True)의 청크를 동시 실행 수 제한과 재시도를 적용하여 내보냅니다.
+
+    스트림은 끝까지 읽을 때까지 LLM 연결을 점유하므로 슬롯도 마지막 청크까지 유지합니다.
+    """
+    for attempt in range(LLM_MAX_ATTEMPTS):
+        async with _llm_semaphore:
+            try:
+                response = await ROUTER.acompletion(stream=True, **kwargs)
+            except RETRYABLE_LLM_ERRORS:
+                if attempt == LLM_MAX_ATTEMPTS - 1:
+                    raise
+            else:
+                async for chunk in response:
+                    yield chunk
+                return
+        await asyncio.sleep(2**attempt + random.random())
+
+
+# --- LLM 응답 캐시 ---
+# 같은 모델/temperature/메시지로 다시 요청하면 LLM을 호출하지 않고 이전 응답을 돌려줍니다. (정확히 일치하는 요청만)
+LLM_CACHE_TTL = 7 * 24 * 60 * 60
+LLM_CACHE_MAXSIZE = 256
+_llm_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+
+def _cache_key(messages: List[Dict[str, str]], model: str, temperature: float) -> str:
+    payload = json.dumps([model, temperature, messages], ensure_ascii=False)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+def _cache_get(key: str) -> Optional[str]:
+    entry = _llm_cache.get(key)
+    if entry is not None and time.monotonic() - entry[0] < LLM_CACHE_TTL:
+        _llm_cache.move_to_end(key)
+        return entry[1]
+    return None
+
+
+def _cache_put(key: str, content: str) -> None:
+    _llm_cache[key] = (time.monotonic(), content)
+    _llm_cache.move_to_end(key)
+    if len(_llm_cache) > LLM_CACHE_MAXSIZE:
+        _llm_cache.popitem(last=False)
+
+
+async def cached_completion(
+    messages: List[Dict[str, str]], model: str = WRITER_MODEL, temperature: float = 0.4
+) -> str:
+    """LLM 응답 텍스트를 캐시를 거쳐 반환합니다."""
+    key = _cache_key(messages, model, temperature)
+    content = _cache_get(key)
+    if content is not None:
+        return content
+
+    response = await acompletion_guarded(model=model, messages=messages, temperature=temperature)
+    content = response.choices[0].message.content
+    _cache_put(key, content)
+    return content
+
+
+async def stream_completion(
+    messages: List[Dict[str, str]], model: str = WRITER_MODEL, temperature: float = 0.4
+) -> AsyncIterator[str]:
+    """스트리밍 LLM 응답(stream=True)의 텍스트 조각을 도착하는 대로 내보냅니다.
+
+    캐시에 있으면 전체 텍스트를 한 조각으로 내보내고, 끝까지 받은 응답은 캐시에 저장합니다.
+    """
+    key = _cache_key(messages, model, temperature)
+    content = _cache_get(key)
+    if content is not None:
+        yield content
+        return
+
+    chunks = []
+    # 소비자가 중간에 멈춰도 스트림을 닫아 세마포어 슬롯이 바로 반납되도록 합니다.
+    async with aclosing(astream_guarded(model=model, messages=messages, temperature=temperature)) as stream:
+        async for chunk in stream:
+            text = chunk.choices[0].delta.content or ""
+            if text:
+                chunks.append(text)
+                yield text
+    _cache_put(key, "".join(chunks))
+
 
 class WritingAgentExecutor(AgentExecutor):
     """글쓰기 에이전트 실행기 - A2A 표준 준수"""
@@ -34,6 +203,26 @@ class WritingAgentExecutor(AgentExecutor):
             task_id = context.request.get("taskId")
             context_id = context.request.get("contextId")
 
+            # 여러 주제를 한 번에 작성하는 배치 요청 (message.texts에 주제 목록)
+            if skill_id == "batch_writing":
+                texts = context.request.get("message", {}).get("texts", [])
+                if not texts:
+                    return {
+                        "task": {
+                            "id": str(uuid.uuid4()),
+                            "status": {"state": "failed", "message": "메시지가 비어있습니다."},
+                        }
+                    }
+
+                results = await self.write_articles(texts)
+                return {
+                    "task": {
+                        "id": str(uuid.uuid4()),
+                        "status": {"state": "completed", "message": f"글쓰기 {len(results)}건 완료"},
+                        "artifacts": [{"type": "text/plain", "content": result} for result in results],
+                    }
+                }
+
             if not message:
                 return {
                     "task": {
@@ -86,52 +275,63 @@ class WritingAgentExecutor(AgentExecutor):
                 }
             }
 
+    async def execute_stream(self, context: RequestContext) -> AsyncIterator[Dict[str, Any]]:
+        """message/stream 요청용 실행 메서드 - 글이 생성되는 대로 artifact 조각을 담은 태스크 이벤트를 내보냅니다."""
+
+        message = context.request.get("message", {}).get("text", "")
+        skill_id = context.request.get("skill", "")
+        task_id = context.request.get("taskId")
+
+        # 배치 요청은 스트리밍하지 않고 execute 결과를 한 번에 보냅니다.
+        if not message or skill_id not in ("", "writing", "revision"):
+            yield await self.execute(context)
+            return
+
+        if skill_id == "writing" or (not skill_id and not task_id):
+            task_id = str(uuid.uuid4())
+            messages = [WRITING_SYSTEM_MESSAGE, {"role": "user", "content": f"주제 또는 요청: {message}"}]
+            temperature, done_message, prefix = 0.4, "글쓰기 완료 (피드백 가능)", ""
+        else:
+            # execute/process_feedback과 같은 태스크 ID 규칙과 응답 머리말을 사용합니다.
+            task_id = task_id or str(uuid.uuid4())
+            messages = [FEEDBACK_SYSTEM_MESSAGE, {"role": "user", "content": f"피드백: {message}"}]
+            temperature, done_message, prefix = 0.3, "피드백 반영 완료", "피드백 반영 완료:\n\n"
+
+        yield {"task": {"id": task_id, "status": {"state": "working"}, "supports_feedback": True}}
+        if prefix:
+            yield {"task": {"id": task_id, "artifacts": [{"type": "text/plain", "content": prefix}]}}
+        try:
+            async for text in stream_completion(messages, temperature=temperature):
+                yield {"task": {"id": task_id, "artifacts": [{"type": "text/plain", "content": text}]}}
+        except Exception as e:
+            yield {"task": {"id": task_id, "status": {"state": "failed", "message": f"글쓰기 수행 중 오류: {str(e)}"}}}
+            return
+        yield {"task": {"id": task_id, "status": {"state": "completed", "message": done_message}}}
+
     async def write_article(self, message: str) -> str:
         """글쓰기 요청을 처리합니다."""
 
-        writing_prompt = f"""
-다음 주제에 대한 체계적인 글을 작성해주세요:
-
-주제 또는 요청: {message}
-
-다음 구조로 작성해주세요:
-1. 서론 (문제 제기, 글의 목적)
-2. 본론 (주요 내용, 논점들)
-3. 결론 (요약 및 시사점)
-
-약 1000-1500자 정도로 작성해주세요.
-한국어로 작성하고, 체계적이고 논리적으로 구성해주세요.
-"""
+        messages = [WRITING_SYSTEM_MESSAGE, {"role": "user", "content": f"주제 또는 요청: {message}"}]
 
         try:
-            response = await litellm.acompletion(
-                model="gpt-4o-mini", messages=[{"role": "user", "content": writing_prompt}], temperature=0.4
-            )
-
-            return response.choices[0].message.content
+            return await cached_completion(messages, temperature=0.4)
 
         except Exception as e:
             return f"글쓰기 수행 중 오류가 발생했습니다: {str(e)}"
 
+    async def write_articles(self, messages: List[str]) -> List[str]:
+        """여러 글쓰기 요청을 동시에 처리합니다. (결과는 요청 순서대로, 동시 LLM 호출 수는 LLM_INFLIGHT_LIMIT로 제한)"""
+        return list(await asyncio.gather(*(self.write_article(message) for message in messages)))
+
     async def process_feedback(self, feedback: str, task_id: Optional[str] = None) -> str:
         """사용자 피드백을 처리합니다."""
 
-        feedback_prompt = f"""
-사용자로부터 다음과 같은 피드백을 받았습니다:
-
-피드백: {feedback}
-
-이 피드백을 반영하여 글을 개선하는 방안을 제시해주세요.
-구체적인 수정 사항과 개선 방향을 설명해주세요.
-가능하면 수정된 부분을 포함하여 답변해주세요.
-"""
+        messages = [FEEDBACK_SYSTEM_MESSAGE, {"role": "user", "content": f"피드백: {feedback}"}]
 
         try:
-            response = await litellm.acompletion(
-                model="gpt-4o-mini", messages=[{"role": "user", "content": feedback_prompt}], temperature=0.3
-            )
+            content = await cached_completion(messages, temperature=0.3)
 
-            return f"피드백 반영 완료:\n\n{response.choices[0].message.content}"
+            return f"피드백 반영 완료:\n\n{content}"
 
         except Exception as e:
             return f"피드백 처리 중 오류가 발생했습니다: {str(e)}"
@@ -144,6 +344,72 @@ class WritingAgentApp(JSONRPCApplication):
         """에이전트 실행기를 빌드합니다."""
         return WritingAgentExecutor()
 
+    async def _handle_requests(self, request: Request) -> Response:
+        """JSON-RPC POST 요청을 처리합니다.
+
+        요청 배열(배치)과 message/stream은 직접 응답하고, 나머지는 SDK 기본 처리로 넘깁니다.
+        """
+        try:
+            body = await request.json()
+        except ValueError:
+            # 잘못된 JSON은 SDK가 JSON-RPC Parse error로 응답합니다. (본문은 Request에 캐시되어 다시 읽을 수 있음)
+            return await super()._handle_requests(request)
+
+        if isinstance(body, list):
+            responses = await self.handle_batch(body)
+            # 알림(notification)만 담긴 배치에는 응답 본문을 보내지 않습니다.
+            return JSONResponse(responses) if responses else Response(status_code=204)
+        if isinstance(body, dict) and body.get("method") == "message/stream":
+            return await self.handle_stream(body.get("id"), RequestContext(request=body.get("params", {})))
+        return await super()._handle_requests(request)
+
+    async def _handle_get_agent_card(self, request: Request) -> Response:
+        """Agent Card 조회 요청에 미리 직렬화해 둔 JSON을 그대로 응답합니다.
+
+        a2a-sdk 0.3+는 이 핸들러를 AGENT_CARD_WELL_KNOWN_PATH(/.well-known/agent-card.json, a2a_demo가 조회하는 경로)와
+        이전 경로 PREV_AGENT_CARD_WELL_KNOWN_PATH(/.well-known/agent.json) 두 곳에 연결합니다.
+        SDK 핸들러를 재정의하여 요청마다 카드를 다시 직렬화하지 않습니다.
+        """
+        return Response(
+            content=WRITING_AGENT_CARD_JSON,
+            media_type="application/json",
+            headers={"Cache-Control": "public, max-age=300"},
+        )
+
+    async def handle_stream(self, request_id: Any, context: RequestContext) -> StreamingResponse:
+        """message/stream 요청을 SSE로 응답합니다. (이벤트마다 JSON-RPC 응답 하나)"""
+
+        async def events():
+            async for result in self.build().execute_stream(context):
+                payload = json.dumps({"jsonrpc": "2.0", "id": request_id, "result": result}, ensure_ascii=False)
+                yield f"data: {payload}\n\n"
+
+        return StreamingResponse(events(), media_type="text/event-stream")
+
+    async def handle_batch(self, batch: List[Dict[str, Any]]) -> Any:
+        """JSON-RPC 2.0 배치 요청(요청 배열)을 한 번의 POST로 받아 동시에 처리합니다.
+
+        응답은 요청 순서대로 반환하며 id가 없는 알림(notification)은 응답에서 제외합니다.
+        LLM 호출은 배치 크기와 관계없이 _llm_semaphore로 동시 실행 수가 제한됩니다.
+        """
+        if not batch or len(batch) > JSONRPC_BATCH_LIMIT:
+            message = f"배치 요청은 1-{JSONRPC_BATCH_LIMIT}개여야 합니다."
+            return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": message}}
+
+        executor = self.build()
+
+        async def dispatch(rpc: Any) -> Dict[str, Any]:
+            if not isinstance(rpc, dict):
+                return {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "잘못된 요청입니다."}}
+            if rpc.get("method") != "message/send":
+                error = {"code": -32601, "message": f"지원하지 않는 메서드: {rpc.get('method')}"}
+                return {"jsonrpc": "2.0", "id": rpc.get("id"), "error": error}
+            result = await executor.execute(RequestContext(request=rpc.get("params", {})))
+            return {"jsonrpc": "2.0", "id": rpc.get("id"), "result": result}
+
+        responses = await asyncio.gather(*(dispatch(rpc) for rpc in batch))
+        return [response for rpc, response in zip(batch, responses) if not isinstance(rpc, dict) or "id" in rpc]
+
 
 # A2A Agent Card 정의 (완전한 필수 필드 포함)
 WRITING_AGENT_CARD = AgentCard(
@@ -151,7 +417,7 @@ WRITING_AGENT_CARD = AgentCard(
     version="1.0.0",
     description="사용자 인터럽션과 피드백 루프가 포함된 A2A 표준 준수 글쓰기 에이전트입니다.",
     url="http://localhost:8001",
-    capabilities={"streaming": False, "push_notifications": False, "feedback_loops": True, "user_interruption": True},
+    capabilities={"streaming": True, "push_notifications": False, "feedback_loops": True, "user_interruption": True},
     default_input_modes=["text/plain"],
     default_output_modes=["text/plain"],
     security=[],
@@ -168,6 +434,18 @@ WRITING_AGENT_CARD = AgentCard(
                 }
             ],
         ),
+        AgentSkill(
+            id="batch_writing",
+            name="일괄 글쓰기",
+            description="여러 주제에 대한 글을 동시에 작성합니다.",
+            tags=["writing", "batch"],
+            examples=[
+                {
+                    "request": {"message": {"texts": ["AI 기술의 미래", "양자컴퓨팅의 현재"]}},
+                    "response": "주제별로 작성된 글을 요청 순서대로 반환합니다.",
+                }
+            ],
+        ),
         AgentSkill(
             id="revision",
             name="글 수정",
@@ -183,6 +461,9 @@ WRITING_AGENT_CARD = AgentCard(
     ],
 )
 
+# Agent Card는 프로세스가 실행되는 동안 바뀌지 않으므로 import 시 한 번만 직렬화합니다.
+WRITING_AGENT_CARD_JSON: bytes = WRITING_AGENT_CARD.model_dump_json().encode()
+
 
 async def main():
     """글쓰기 에이전트 서버를 시작합니다."""
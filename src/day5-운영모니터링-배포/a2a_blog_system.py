@@ -1,189 +1,219 @@
 # --- Imports ---
 import asyncio
+import hmac
+import logging
 import os
 from contextlib import asynccontextmanager
-from typing import Optional
+from typing import Any, Dict, List, Optional
 
 from a2a_protocol import *
 from content_creation_crew import MCPClient, handle_creation_logic
 from dialogue_manager_langgraph import handle_dialogue_logic
 from fastapi import Depends, FastAPI, HTTPException, Security
+from fastapi.responses import ORJSONResponse
 from fastapi.security import APIKeyHeader
 
 # Langfuse v3 SDK import
 from langfuse import get_client
+from mcp_client import create_http_client
 from quality_control_adk import handle_qc_logic
+from settings import SETTINGS
+
+# 로그 설정은 게이트웨이에서 한 번만 합니다. (각 서비스 모듈은 logging.getLogger(__name__)만 사용)
+# 요청마다 남기는 로그는 DEBUG 레벨이므로, LOG_LEVEL=DEBUG일 때만 메시지를 만들고 출력합니다.
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("a2a_gateway")
 
 # Langfuse 클라이언트 전역 변수
 langfuse_client = None
 
+# --- MCP Client Setup ---
+mcp_client: Optional[MCPClient] = None
+
 
 # --- FastAPI Lifespan ---
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    global langfuse_client
+    global langfuse_client, mcp_client
     # Startup: Langfuse 클라이언트 초기화
     try:
         langfuse_client = get_client()
         if langfuse_client:
             if langfuse_client.auth_check():
-                print("Langfuse 클라이언트가 성공적으로 초기화되었습니다.")
+                logger.info("Langfuse 클라이언트가 성공적으로 초기화되었습니다.")
             else:
-                print("Langfuse 인증 실패")
+                logger.warning("Langfuse 인증 실패")
     except Exception as e:
-        print(f"Langfuse 초기화 실패: {e}")
+        logger.warning("Langfuse 초기화 실패: %s", e)
         langfuse_client = None
 
+    # Startup: MCP 클라이언트 초기화 (모든 Tool 호출이 하나의 HTTP 커넥션 풀을 공유)
+    http_client = create_http_client()
+    if SETTINGS.mcp_server_url:
+        mcp_client = MCPClient(
+            base_url=SETTINGS.mcp_server_url,
+            api_key=SETTINGS.master_api_key,
+            http_client=http_client,
+        )
+        # 첫 실제 요청이 연결 비용을 치르지 않도록 기동 단계에서 커넥션을 미리 맺어 둡니다.
+        await mcp_client.warmup()
+        logger.info("MCP 클라이언트가 '%s'에 연결되었습니다.", SETTINGS.mcp_server_url)
+    else:
+        logger.warning("MCP_SERVER_URL이 설정되지 않아 MCP 클라이언트를 초기화할 수 없습니다.")
+
     yield  # 서버 실행
 
+    # Shutdown: HTTP 커넥션 풀 정리
+    await http_client.aclose()
+
     # Shutdown: Langfuse flush
     if langfuse_client:
         langfuse_client.flush()
-        print("✅ Langfuse 이벤트가 모두 전송되었습니다.")
+        logger.info("Langfuse 이벤트가 모두 전송되었습니다.")
 
 
 # --- App & Security Setup ---
-app = FastAPI(title="A2A Integrated Research Blog System", version="1.0.0", lifespan=lifespan)
+# 응답 직렬화는 orjson으로 처리합니다. (초안/최종 글처럼 큰 본문을 담은 응답에서 표준 json보다 빠름)
+app = FastAPI(
+    title="A2A Integrated Research Blog System",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
 
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
+MASTER_API_KEY = SETTINGS.master_api_key.encode()
 
 
 async def get_api_key(api_key: str = Security(api_key_header)):
-    if api_key == os.environ.get("MASTER_API_KEY"):
+    # 타이밍 공격을 막기 위해 상수 시간 비교
+    if api_key and hmac.compare_digest(api_key.encode(), MASTER_API_KEY):
         return api_key
     else:
         raise HTTPException(status_code=401, detail="Invalid API Key")
 
 
-# --- MCP Client Setup ---
-mcp_client: Optional[MCPClient] = None
-
-
-@app.on_event("startup")
-def startup_event():
-    global mcp_client
-    mcp_server_url = os.environ.get("MCP_SERVER_URL")
-    master_key = os.environ.get("MASTER_API_KEY")
-    if mcp_server_url and master_key:
-        mcp_client = MCPClient(base_url=mcp_server_url, api_key=master_key)
-        print(f"A2A Gateway: MCP 클라이언트가 '{mcp_server_url}'에 연결되었습니다.")
-    else:
-        print("A2A Gateway: MCP_SERVER_URL 또는 MASTER_API_KEY가 설정되지 않아 MCP 클라이언트를 초기화할 수 없습니다.")
-
-
 # --- Endpoints ---
 @app.get("/", tags=["Status"])
 async def root():
     return {"status": "ok", "message": "A2A Gateway is alive"}
 
 
-@app.post("/api/v1/dialogue", response_model=DialogueResponse, tags=["A2A Protocol"])
-async def handle_dialogue(request: DialogueRequest, api_key: str = Depends(get_api_key)):
-
-    if langfuse_client:
-        with langfuse_client.start_as_current_span(
-            name="dialogue-request", input={"user_input": request.user_input, "session_id": request.session_id}
-        ) as span:
-            # 트레이스 속성 설정
-            span.update_trace(
-                session_id=request.session_id, tags=["dialogue", "api"], metadata={"endpoint": "/api/v1/dialogue"}
-            )
-
-            try:
-                result = await handle_dialogue_logic(request.user_input)
-
-                # 결과 업데이트
-                span.update(output=result)
-                span.update_trace(output=result)
+@asynccontextmanager
+async def traced(name: str, input_: Dict[str, Any], **trace_kwargs):
+    """요청 하나를 Langfuse span으로 감쌉니다. span/trace는 요청이 끝날 때 한 번씩만 업데이트합니다.
+
+    본문에서 holder["output"]에 결과를, 실패를 응답으로 처리한 경우 holder["error"]에 메시지를 넣습니다.
+    예외가 발생하면 ERROR로 기록한 뒤 그대로 다시 발생시킵니다. Langfuse가 없으면 추적 없이 실행합니다.
+    """
+    holder: Dict[str, Any] = {"output": None, "error": None}
+    if not langfuse_client:
+        yield holder
+        return
+
+    with langfuse_client.start_as_current_span(name=name, input=input_) as span:
+        try:
+            yield holder
+        except Exception as e:
+            holder["output"] = {"error": str(e), "status": "FAILED"}
+            holder["error"] = str(e)
+            raise
+        finally:
+            if holder["error"]:
+                span.update(output=holder["output"], level="ERROR", status_message=f"{name} failed: {holder['error']}")
+            else:
+                span.update(output=holder["output"])
+            span.update_trace(output=holder["output"], **trace_kwargs)
 
-                return DialogueResponse(session_id=request.session_id, **result)
 
-            except Exception as e:
-                span.update(
-                    output={"error": str(e)}, level="ERROR", status_message=f"Dialogue processing failed: {str(e)}"
-                )
-                raise
-    else:
-        # Langfuse 없이 실행
-        result = await handle_dialogue_logic(request.user_input)
-        return DialogueResponse(session_id=request.session_id, **result)
+@app.post("/api/v1/dialogue", response_model=DialogueResponse, tags=["A2A Protocol"])
+async def handle_dialogue(request: DialogueRequest, api_key: str = Depends(get_api_key)):
+    async with traced(
+        "dialogue-request",
+        {"user_input": request.user_input, "session_id": request.session_id},
+        session_id=request.session_id,
+        tags=["dialogue", "api"],
+        metadata={"endpoint": "/api/v1/dialogue"},
+    ) as trace:
+        result = await handle_dialogue_logic(request.user_input, request.session_id)
+        trace["output"] = result
+    return DialogueResponse(session_id=request.session_id, **result)
 
 
 @app.post("/api/v1/create-content", response_model=ContentCreationResponse, tags=["A2A Protocol"])
 async def handle_content_creation(request: ContentCreationRequest, api_key: str = Depends(get_api_key)):
-
-    if langfuse_client:
-        with langfuse_client.start_as_current_span(
-            name="content-creation-request",
-            input={"topic": request.topic, "user_preferences": request.user_preferences},
-        ) as span:
-            # 트레이스 속성 설정
-            span.update_trace(
-                tags=["content-creation", "api"],
-                metadata={"endpoint": "/api/v1/create-content", "topic": request.topic},
-            )
-
-            try:
-                draft = await asyncio.to_thread(
-                    handle_creation_logic, request.topic, request.user_preferences, mcp_client
-                )
-
-                # 결과 업데이트
-                response_data = {"draft_content": draft, "status": "COMPLETED"}
-                span.update(output=response_data)
-                span.update_trace(output=response_data)
-
-                return ContentCreationResponse(draft_content=draft, status="COMPLETED")
-
-            except Exception as e:
-                error_data = {"error": str(e), "status": "FAILED"}
-                span.update(output=error_data, level="ERROR", status_message=f"Content creation failed: {str(e)}")
-                return ContentCreationResponse(draft_content="", status="FAILED", error_message=str(e))
-    else:
-        # Langfuse 없이 실행
+    async with traced(
+        "content-creation-request",
+        {"topic": request.topic, "user_preferences": request.user_preferences},
+        tags=["content-creation", "api"],
+        metadata={"endpoint": "/api/v1/create-content", "topic": request.topic},
+    ) as trace:
         try:
-            draft = await asyncio.to_thread(handle_creation_logic, request.topic, request.user_preferences, mcp_client)
-            return ContentCreationResponse(draft_content=draft, status="COMPLETED")
+            draft = await handle_creation_logic(request.topic, request.user_preferences, mcp_client)
         except Exception as e:
+            trace["output"] = {"error": str(e), "status": "FAILED"}
+            trace["error"] = str(e)
             return ContentCreationResponse(draft_content="", status="FAILED", error_message=str(e))
+        trace["output"] = {"draft_content": draft, "status": "COMPLETED"}
+    return ContentCreationResponse(draft_content=draft, status="COMPLETED")
 
 
 @app.post("/api/v1/quality-control", response_model=QualityControlResponse, tags=["A2A Protocol"])
 async def handle_quality_control(request: QualityControlRequest, api_key: str = Depends(get_api_key)):
-
-    if langfuse_client:
-        with langfuse_client.start_as_current_span(
-            name="quality-control-request",
-            input={"topic": request.topic, "draft_content_length": len(request.draft_content)},
-        ) as span:
-            # 트레이스 속성 설정
-            span.update_trace(
-                tags=["quality-control", "api"],
-                metadata={"endpoint": "/api/v1/quality-control", "topic": request.topic},
-            )
-
-            try:
-                final_post, report = await handle_qc_logic(request.topic, request.draft_content)
-
-                # 결과 업데이트
-                response_data = {"final_post": final_post, "qa_report": report, "status": "COMPLETED"}
-                span.update(output=response_data)
-                span.update_trace(output=response_data)
-
-                return QualityControlResponse(final_post=final_post, qa_report=report, status="COMPLETED")
-
-            except Exception as e:
-                span.update(
-                    output={"error": str(e), "status": "FAILED"},
-                    level="ERROR",
-                    status_message=f"Quality control failed: {str(e)}",
-                )
-                raise
-    else:
-        # Langfuse 없이 실행
+    async with traced(
+        "quality-control-request",
+        {"topic": request.topic, "draft_content_length": len(request.draft_content)},
+        tags=["quality-control", "api"],
+        metadata={"endpoint": "/api/v1/quality-control", "topic": request.topic},
+    ) as trace:
         final_post, report = await handle_qc_logic(request.topic, request.draft_content)
-        return QualityControlResponse(final_post=final_post, qa_report=report, status="COMPLETED")
-
-
-print("a2a_blog_system.py 파일이 Langfuse v3 SDK로 업데이트되었습니다.")
+        trace["output"] = {"final_post": final_post, "qa_report": report, "status": "COMPLETED"}
+    return QualityControlResponse(final_post=final_post, qa_report=report, status="COMPLETED")
+
+
+# --- Pipeline Batch: 대화 -> 콘텐츠 제작 -> 품질 관리를 여러 요청에 대해 동시에 실행 ---
+# LLM/Tool 호출은 대부분 네트워크 대기이므로 요청들을 겹쳐 실행하되, 제공자 Rate limit을 넘지 않도록 동시 실행 수를 제한합니다.
+PIPELINE_SEMAPHORE = asyncio.Semaphore(int(os.environ.get("MAX_CONCURRENCY", "4")))
+
+
+async def run_pipeline(request: DialogueRequest) -> PipelineResponse:
+    async with PIPELINE_SEMAPHORE:
+        dialogue = await handle_dialogue_logic(request.user_input, request.session_id)
+        next_action = dialogue["next_action"]
+        topic = next_action["topic"]
+        draft = await handle_creation_logic(topic, next_action["user_preferences"], mcp_client)
+        final_post, report = await handle_qc_logic(topic, draft)
+    # handle_qc_logic은 예외 대신 status="Failed"인 보고서를 돌려주므로 여기서 실패로 변환합니다.
+    if report.get("status") == "Failed":
+        return PipelineResponse(
+            session_id=request.session_id,
+            topic=topic,
+            final_post="",
+            qa_report=report,
+            status="FAILED",
+            error_message=report.get("error"),
+        )
+    return PipelineResponse(
+        session_id=request.session_id, topic=topic, final_post=final_post, qa_report=report, status="COMPLETED"
+    )
+
+
+@app.post("/api/v1/pipeline-batch", response_model=List[PipelineResponse], tags=["A2A Protocol"])
+async def handle_pipeline_batch(requests: List[DialogueRequest], api_key: str = Depends(get_api_key)):
+    results = await asyncio.gather(*(run_pipeline(request) for request in requests), return_exceptions=True)
+    return [
+        (
+            PipelineResponse(
+                session_id=request.session_id,
+                topic="",
+                final_post="",
+                qa_report={},
+                status="FAILED",
+                error_message=str(result),
+            )
+            if isinstance(result, Exception)
+            else result
+        )
+        for request, result in zip(requests, results)
+    ]
@@ -34,3 +34,12 @@ class QualityControlResponse(BaseModel):
     final_post: str
     qa_report: Dict[str, Any]
     status: str
+
+
+class PipelineResponse(BaseModel):
+    session_id: str
+    topic: str
+    final_post: str
+    qa_report: Dict[str, Any]
+    status: str
+    error_message: Optional[str] = None
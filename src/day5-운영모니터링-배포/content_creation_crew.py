@@ -1,70 +1,110 @@
-import json
+import asyncio
+import logging
+from operator import itemgetter
+from typing import Optional
 
-from crewai import Agent, Crew, Process, Task
-from langchain.tools import BaseTool
+from langchain_core.output_parsers import StrOutputParser
+from langchain_core.prompts import ChatPromptTemplate
+from langchain_core.runnables import RunnableParallel, RunnablePassthrough
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langfuse import observe
 from langfuse.langchain import CallbackHandler as LangfuseCallbackHandler
-from mcp_client import MCPClient
+from mcp_client import MCPClient, dump_json
 
+logger = logging.getLogger(__name__)
 
-class MCPTool(BaseTool):
-    name: str
-    description: str
-    client: MCPClient
+# 리서처/작가 체인의 프롬프트 (기존 CrewAI Agent의 role/backstory와 Task 설명을 옮긴 것)
+# 작가는 짧은 개요(skeleton)만 받아 바로 초안을 쓰고, 그동안 리서처는 심층 보고서를 작성합니다.
+# 두 결과가 모두 나오면 짧은 다듬기(refine) 단계에서 보고서의 내용을 초안에 반영합니다.
+RESEARCHER_SYSTEM = "당신은 20년 경력의 기술 분석 전문가인 선임 리서처입니다."
+WRITER_SYSTEM = "당신은 기술 분야의 베스트셀러 작가입니다."
+SEARCH_RESULTS = "[웹 검색 결과]\n{web_results}\n\n[학술 논문 검색 결과]\n{arxiv_results}"
 
-    @observe(name="mcp-tool-call")
-    def _run(self, query: str) -> str:
-        print(f"  [MCP Bridge] CrewAI -> MCP Server: Calling tool '{self.name}' with query '{query}'")
-        response = self.client.call_tool(self.name, query)
-        return json.dumps(response, ensure_ascii=False)
+SKELETON_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", RESEARCHER_SYSTEM),
+        (
+            "human",
+            "'{topic}'에 대한 블로그 글의 개요를 핵심 논점 위주로 5줄 이내로 작성하세요. 설명은 생략하세요.\n\n"
+            + SEARCH_RESULTS,
+        ),
+    ]
+)
+RESEARCH_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", RESEARCHER_SYSTEM),
+        (
+            "human",
+            "'{topic}'에 대해 웹과 학술 자료를 종합하여 구조화된 심층 분석 보고서를 작성하세요.\n\n" + SEARCH_RESULTS,
+        ),
+    ]
+)
+WRITE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", WRITER_SYSTEM),
+        (
+            "human",
+            "다음 개요를 바탕으로, '{user_preferences}' 스타일을 반영하여 '{topic}'에 대한 매력적인 블로그 초안을 작성하세요.\n\n"
+            "[개요]\n{outline}",
+        ),
+    ]
+)
+REFINE_PROMPT = ChatPromptTemplate.from_messages(
+    [
+        ("system", WRITER_SYSTEM),
+        (
+            "human",
+            "리서치 보고서의 사실과 근거를 반영하여 블로그 초안을 다듬으세요. "
+            "'{user_preferences}' 스타일과 초안의 구성은 유지하고, 완성된 글만 출력하세요.\n\n"
+            "[리서치 보고서]\n{report}\n\n[블로그 초안]\n{draft}",
+        ),
+    ]
+)
 
+# 모든 요청이 공유하는 Langfuse 핸들러
+_HANDLER = LangfuseCallbackHandler()
 
-def handle_creation_logic(topic: str, user_preferences: str, mcp_client: MCPClient):
-    print(f"[CrewAI Service] 👥 콘텐츠 제작팀 가동됨 (주제: {topic[:30]}...)")
-    try:
-        handler = LangfuseCallbackHandler()
 
-        crew_web_search = MCPTool(name="web_search", description="웹에서 최신 정보를 검색합니다.", client=mcp_client)
-        crew_arxiv_search = MCPTool(name="arxiv_search", description="학술 논문을 검색합니다.", client=mcp_client)
+@observe(name="mcp-tool-call")
+async def call_mcp_tool(mcp_client: Optional[MCPClient], tool_name: str, query: str) -> str:
+    if mcp_client is None:
+        return dump_json({"error": "MCP 클라이언트가 초기화되지 않았습니다."})
+    logger.debug("mcp.call tool=%s query=%s", tool_name, query[:80])
+    response = await mcp_client.acall_tool(tool_name, query)
+    return dump_json(response)
 
-        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", callbacks=[handler])
-        researcher = Agent(
-            role="선임 리서처",
-            goal=f"{topic}에 대한 심층 분석",
-            backstory="당신은 20년 경력의 기술 분석 전문가입니다.",
-            tools=[crew_web_search, crew_arxiv_search],
-            llm=llm,
-            verbose=True,
-        )
-        writer = Agent(
-            role="전문 작가",
-            goal="리서치 결과를 바탕으로 매력적인 블로그 글 작성",
-            backstory="당신은 기술 분야의 베스트셀러 작가입니다.",
-            llm=llm,
-            verbose=True,
-        )
 
-        research_task = Task(
-            description=f"'{topic}'에 대해 웹과 학술 자료를 종합하여 심층 분석 보고서를 작성하세요.",
-            expected_output="구조화된 분석 보고서",
-            agent=researcher,
+async def handle_creation_logic(topic: str, user_preferences: str, mcp_client: Optional[MCPClient]) -> str:
+    logger.debug("creation.start topic=%s", topic[:30])
+    try:
+        llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash")
+        skeleton = (SKELETON_PROMPT | llm | StrOutputParser()).with_config(run_name="skeleton")
+        researcher = (RESEARCH_PROMPT | llm | StrOutputParser()).with_config(run_name="researcher")
+        writer = (WRITE_PROMPT | llm | StrOutputParser()).with_config(run_name="writer")
+        refiner = (REFINE_PROMPT | llm | StrOutputParser()).with_config(run_name="refiner")
+        # 개요 -> 초안 경로와 심층 보고서 경로를 동시에 실행한 뒤, 둘을 합쳐 다듬습니다.
+        # 전체 지연 시간 ≈ max(보고서, 개요 + 초안) + 다듬기 (기존: 보고서 + 초안)
+        drafter = RunnablePassthrough.assign(outline=skeleton) | writer
+        chain = RunnableParallel(
+            report=researcher, draft=drafter, user_preferences=itemgetter("user_preferences")
+        ) | refiner
+
+        # 웹/논문 검색은 서로 독립적이므로 동시에 호출합니다.
+        web_results, arxiv_results = await asyncio.gather(
+            call_mcp_tool(mcp_client, "web_search", topic), call_mcp_tool(mcp_client, "arxiv_search", topic)
         )
-        write_task = Task(
-            description=f"리서치 보고서를 바탕으로, '{user_preferences}' 스타일을 반영하여 블로그 초안을 작성하세요.",
-            expected_output="완성된 블로그 초안",
-            agent=writer,
-            context=[research_task],
+        result = await chain.ainvoke(
+            {
+                "topic": topic,
+                "user_preferences": user_preferences,
+                "web_results": web_results,
+                "arxiv_results": arxiv_results,
+            },
+            config={"callbacks": [_HANDLER], "metadata": {"endpoint": "create-content"}},
         )
-
-        crew = Crew(agents=[researcher, writer], tasks=[research_task, write_task], process=Process.sequential)
-        result = crew.kickoff()
-        print("[CrewAI Service] ✅ 초안 작성 완료.")
+        logger.debug("creation.done topic=%s", topic[:30])
         return result
-    except Exception as e:
-        error_message = f"CrewAI 실행 중 오류 발생: {e}"
-        print(f"[CrewAI Service] 🔴 {error_message}")
-        return error_message
-
-
-print("✅ content_creation_crew.py 파일이 Langfuse 추적 기능으로 업데이트되었습니다.")
+    except Exception:
+        # 오류 문자열을 초안처럼 돌려주면 호출한 쪽(품질 관리, 파이프라인)이 실패를 구분할 수 없으므로 다시 발생시킵니다.
+        logger.exception("creation.failed topic=%s", topic[:30])
+        raise
@@ -1,34 +1,79 @@
 import json
+import logging
+from typing import Any
 
-import requests
+import httpx
+
+try:
+    import orjson
+
+    load_json = orjson.loads
+
+    def dump_json(data: Any) -> str:
+        return orjson.dumps(data).decode()
+
+    def dump_json_bytes(data: Any) -> bytes:
+        return orjson.dumps(data)
+
+except ImportError:  # orjson이 설치되지 않은 환경에서는 표준 json 모듈 사용
+    load_json = json.loads
+
+    def dump_json(data: Any) -> str:
+        return json.dumps(data, ensure_ascii=False)
+
+    def dump_json_bytes(data: Any) -> bytes:
+        return json.dumps(data, ensure_ascii=False).encode()
+
+
+logger = logging.getLogger(__name__)
+
+
+def create_http_client() -> httpx.AsyncClient:
+    """MCP 서버 호출에 공유할 HTTP 클라이언트를 만듭니다. (keep-alive 커넥션 풀 재사용)
+
+    MCP 서버는 내부 서비스이므로 trust_env=False로 프록시/.netrc 등 환경 변수 조회를 생략합니다.
+    """
+    transport = httpx.AsyncHTTPTransport(
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=50), trust_env=False
+    )
+    return httpx.AsyncClient(timeout=120.0, transport=transport, trust_env=False)
 
 
 class MCPClient:
-    def __init__(self, base_url: str, api_key: str):
+    def __init__(self, base_url: str, api_key: str, http_client: httpx.AsyncClient):
         if not base_url:
             raise ValueError("MCP 서버의 base_url이 필요합니다.")
         self.base_url = base_url.rstrip("/")
         self.headers = {"X-API-Key": api_key, "Content-Type": "application/json"}
+        self._client = http_client
+
+    async def warmup(self) -> None:
+        """서버 시작 시 MCP 서버에 한 번 요청하여 DNS 조회와 TCP/TLS 연결을 미리 맺어 둡니다. (실패해도 무시)"""
+        try:
+            await self._client.get(f"{self.base_url}/", timeout=5.0)
+        except httpx.HTTPError as e:
+            logger.warning("MCP 서버 사전 연결 실패 (첫 요청 시 다시 연결합니다): %s", e)
 
-    def call_tool(self, tool_name: str, query: str) -> dict:
+    async def acall_tool(self, tool_name: str, query: str) -> dict:
         endpoint = f"{self.base_url}/api/v1/tools/{tool_name}"
-        payload = {"query": query}
+        # 본문을 미리 직렬화해 content로 넘기면 httpx 내부의 json.dumps를 거치지 않습니다. (Content-Type은 self.headers에 포함)
+        payload = dump_json_bytes({"query": query})
         try:
-            response = requests.post(endpoint, headers=self.headers, json=payload, timeout=120)
+            response = await self._client.post(endpoint, headers=self.headers, content=payload)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
+            return load_json(response.content)
+        except httpx.HTTPStatusError as e:
             return {"error": f"HTTP 오류: {e.response.status_code}", "detail": e.response.text}
         except Exception as e:
             return {"error": f"Tool 호출 중 오류 발생: {e}"}
 
-    def get_resource(self, resource_type: str, resource_id: str) -> dict:
+    async def aget_resource(self, resource_type: str, resource_id: str) -> dict:
         endpoint = f"{self.base_url}/api/v1/resources/{resource_type}/{resource_id}"
         try:
-            response = requests.get(endpoint, headers=self.headers, timeout=30)
+            response = await self._client.get(endpoint, headers=self.headers, timeout=30.0)
             response.raise_for_status()
-            return response.json()
-        except requests.exceptions.HTTPError as e:
+            return load_json(response.content)
+        except httpx.HTTPStatusError as e:
             return {"error": f"HTTP 오류: {e.response.status_code}", "detail": e.response.text}
         except Exception as e:
             return {"error": f"리소스 조회 중 오류 발생: {e}"}
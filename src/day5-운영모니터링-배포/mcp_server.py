@@ -1,30 +1,104 @@
 # --- Imports ---
+import hashlib
+import hmac
+import logging
+import math
 import os
-from typing import Dict
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable
 
 from fastapi import Depends, FastAPI, HTTPException, Request, Security
+from fastapi.responses import ORJSONResponse
 from fastapi.security import APIKeyHeader
-from langfuse import observe
+from langfuse import get_client, observe
 from pydantic import BaseModel, Field
-from server_resources import get_style_guide, get_template
-from server_tools import arxiv_search, news_api_search, web_search
-from slowapi import Limiter, _rate_limit_exceeded_handler
-from slowapi.errors import RateLimitExceeded
-from slowapi.util import get_remote_address
-
-# --- App & Limiter Setup ---
-app = FastAPI(title="LLM Agent Resource Hub (MCP Server)", version="1.0.0")
-limiter = Limiter(key_func=get_remote_address)
-app.state.limiter = limiter
-app.add_exception_handler(RateLimitExceeded, _rate_limit_exceeded_handler)
+from redis.asyncio import Redis
+from redis.exceptions import RedisError
+from server_resources import get_template_response
+from server_tools import arxiv_search, multi_search, news_api_search, shutdown_arxiv_pool, web_search
+from settings import SETTINGS
+
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO"), format="%(asctime)s %(levelname)s %(name)s %(message)s")
+logger = logging.getLogger("mcp_server")
+
+# --- Redis (Tool 결과 캐시, Rate limit) ---
+redis_client = Redis.from_url(SETTINGS.redis_url)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield  # 서버 실행
+    # Shutdown: Redis 커넥션 풀과 arxiv 검색용 프로세스 풀 정리
+    await redis_client.aclose()
+    shutdown_arxiv_pool()
+
+
+# --- App Setup ---
+# 응답 직렬화는 orjson으로 처리합니다. (검색 결과처럼 중첩된 응답에서 표준 json보다 빠름)
+app = FastAPI(
+    title="LLM Agent Resource Hub (MCP Server)",
+    version="1.0.0",
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse,
+)
+
+# --- Rate Limiting (Redis 토큰 버킷) ---
+# 프로세스 메모리에 카운터를 두면 복제본/워커마다 한도가 따로 잡히므로, 모든 인스턴스가 같은 Redis 버킷을 공유합니다.
+# 토큰 충전과 차감은 Lua 스크립트 하나로 원자적으로 처리합니다. (register_script는 EVALSHA로 스크립트를 재사용)
+TOKEN_BUCKET_LUA = """
+local capacity = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local time = redis.call("TIME")
+local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+local bucket = redis.call("HMGET", KEYS[1], "tokens", "last")
+local tokens = tonumber(bucket[1]) or capacity
+local last = tonumber(bucket[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - last) * rate)
+local allowed = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+    allowed = 1
+end
+redis.call("HSET", KEYS[1], "tokens", tokens, "last", now)
+redis.call("EXPIRE", KEYS[1], math.ceil(capacity / rate))
+return allowed
+"""
+token_bucket = redis_client.register_script(TOKEN_BUCKET_LUA)
+
+
+def rate_limit(scope: str, capacity: int, per_seconds: float = 60.0):
+    """클라이언트 IP별로 per_seconds 동안 capacity번까지 허용하는 의존성을 만듭니다."""
+    refill_rate = capacity / per_seconds
+
+    async def check_rate_limit(request: Request):
+        # 클라이언트 주소를 알 수 없는 경우(일부 ASGI 서버/테스트 클라이언트)에는 고정 키 하나를 공유합니다.
+        client_host = request.client.host if request.client else "unknown"
+        key = f"rl:{client_host}:{scope}"
+        try:
+            allowed = await token_bucket(keys=[key], args=[capacity, refill_rate])
+        except RedisError as e:
+            # Redis 장애 시에는 요청을 막지 않고 통과시킵니다. (fail-open)
+            logger.warning("ratelimit.redis_error key=%s error=%s", key, e)
+            return
+        if not allowed:
+            raise HTTPException(
+                status_code=429,
+                detail=f"Rate limit exceeded: {capacity} per {per_seconds:g} seconds",
+                headers={"Retry-After": str(math.ceil(1 / refill_rate))},
+            )
+
+    return check_rate_limit
+
 
 # --- Security Setup ---
 API_KEY_NAME = "X-API-Key"
 api_key_header = APIKeyHeader(name=API_KEY_NAME, auto_error=False)
+MASTER_API_KEY = SETTINGS.master_api_key.encode()
 
 
 async def get_api_key(api_key: str = Security(api_key_header)):
-    if api_key == os.environ.get("MASTER_API_KEY"):
+    # 타이밍 공격을 막기 위해 상수 시간 비교
+    if api_key and hmac.compare_digest(api_key.encode(), MASTER_API_KEY):
         return api_key
     else:
         raise HTTPException(status_code=401, detail="Invalid or missing API Key")
@@ -35,6 +109,35 @@ class ToolCallRequest(BaseModel):
     query: str = Field(..., description="Tool에 전달할 검색어 또는 입력값")
 
 
+# --- Tool 결과 캐시 ---
+# 리서처와 작가가 같은 주제로 같은 Tool을 호출하는 경우가 많으므로, (tool, 검색어)별 결과를 Redis에 보관합니다.
+# 모든 워커가 같은 캐시를 공유하며, 결과가 바뀌는 주기에 맞춰 Tool마다 TTL을 다르게 둡니다.
+TOOL_CACHE_TTL = {"web_search": 60 * 60, "news_api": 5 * 60, "arxiv_search": 24 * 60 * 60}
+
+
+async def cached_tool_call(tool_name: str, tool: Callable[[str], Awaitable[str]], query: str) -> str:
+    digest = hashlib.blake2b(query.strip().lower().encode(), digest_size=16).hexdigest()
+    key = f"mcp:{tool_name}:{digest}"
+    try:
+        cached = await redis_client.get(key)
+    except RedisError as e:
+        # Redis 장애 시에는 캐시 없이 Tool을 직접 호출합니다.
+        logger.warning("cache.get_error key=%s error=%s", key, e)
+        cached = None
+    if cached is not None:
+        get_client().update_current_span(metadata={"cache_hit": True})
+        return cached.decode()
+
+    result = await tool(query)
+    # 성공한 결과(JSON 배열)만 저장합니다. 오류 응답({"error": ...})은 다음 요청에서 다시 시도합니다.
+    if result.startswith("["):
+        try:
+            await redis_client.set(key, result, ex=TOOL_CACHE_TTL[tool_name])
+        except RedisError as e:
+            logger.warning("cache.set_error key=%s error=%s", key, e)
+    return result
+
+
 # --- Root Endpoint ---
 @app.get("/", summary="서버 상태 확인", tags=["Status"])
 async def read_root():
@@ -42,42 +145,64 @@ async def read_root():
 
 
 # --- Production Endpoints with Langfuse Observability ---
-@app.post("/api/v1/tools/web_search", summary="웹 검색 (보안/속도제한/추적)", tags=["Production Tools"])
-@limiter.limit("20/minute")
+# 인증을 먼저 확인하여, 인증되지 않은 요청이 정상 클라이언트의 IP 버킷을 소진하지 못하게 합니다. (의존성은 목록 순서대로 실행)
+@app.post(
+    "/api/v1/tools/web_search",
+    summary="웹 검색 (보안/속도제한/추적)",
+    tags=["Production Tools"],
+    dependencies=[Depends(get_api_key), Depends(rate_limit("web_search", capacity=20))],
+)
 @observe(name="mcp-tool-web-search")
-async def prod_web_search(request: Request, data: ToolCallRequest, api_key: str = Depends(get_api_key)):
-    result = await web_search(data.query)
+async def prod_web_search(data: ToolCallRequest):
+    result = await cached_tool_call("web_search", web_search, data.query)
     return {"tool": "web_search", "query": data.query, "result": result}
 
 
-@app.post("/api/v1/tools/news_api", summary="뉴스 검색 (보안/속도제한/추적)", tags=["Production Tools"])
-@limiter.limit("20/minute")
+@app.post(
+    "/api/v1/tools/news_api",
+    summary="뉴스 검색 (보안/속도제한/추적)",
+    tags=["Production Tools"],
+    dependencies=[Depends(get_api_key), Depends(rate_limit("news_api", capacity=20))],
+)
 @observe(name="mcp-tool-news-api")
-async def prod_news_search(request: Request, data: ToolCallRequest, api_key: str = Depends(get_api_key)):
-    result = await news_api_search(data.query)
+async def prod_news_search(data: ToolCallRequest):
+    result = await cached_tool_call("news_api", news_api_search, data.query)
     return {"tool": "news_api", "query": data.query, "result": result}
 
 
-@app.post("/api/v1/tools/arxiv_search", summary="논문 검색 (보안/속도제한/추적)", tags=["Production Tools"])
-@limiter.limit("20/minute")
+@app.post(
+    "/api/v1/tools/arxiv_search",
+    summary="논문 검색 (보안/속도제한/추적)",
+    tags=["Production Tools"],
+    dependencies=[Depends(get_api_key), Depends(rate_limit("arxiv_search", capacity=20))],
+)
 @observe(name="mcp-tool-arxiv-search")
-async def prod_arxiv_search(request: Request, data: ToolCallRequest, api_key: str = Depends(get_api_key)):
-    result = await arxiv_search(data.query)
+async def prod_arxiv_search(data: ToolCallRequest):
+    result = await cached_tool_call("arxiv_search", arxiv_search, data.query)
     return {"tool": "arxiv_search", "query": data.query, "result": result}
 
 
+@app.post(
+    "/api/v1/tools/multi_search",
+    summary="웹/뉴스/논문 통합 검색 (보안/속도제한/추적)",
+    tags=["Production Tools"],
+    dependencies=[Depends(get_api_key), Depends(rate_limit("multi_search", capacity=20))],
+)
+@observe(name="mcp-tool-multi-search")
+async def prod_multi_search(data: ToolCallRequest):
+    result = await multi_search(data.query)
+    return {"tool": "multi_search", "query": data.query, "result": result}
+
+
 @app.get(
     "/api/v1/resources/templates/{template_id}",
     summary="템플릿 조회 (보안/속도제한/추적)",
     tags=["Production Resources"],
+    dependencies=[Depends(get_api_key), Depends(rate_limit("templates", capacity=60))],
 )
-@limiter.limit("60/minute")
 @observe(name="mcp-resource-template")
-async def prod_read_template(request: Request, template_id: str, api_key: str = Depends(get_api_key)):
-    content = await get_template(template_id)
-    if isinstance(content, dict) and "error" in content:
-        raise HTTPException(status_code=404, detail=content["error"])
-    return {"resource": "template", "id": template_id, "content": content}
-
-
-print("mcp_server.py 파일이 Langfuse 추적 기능으로 업데이트되었습니다.")
+async def prod_read_template(template_id: str):
+    response = get_template_response(template_id)
+    if response is None:
+        raise HTTPException(status_code=404, detail="Template not found")
+    return response
@@ -1,19 +1,43 @@
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Tuple
+
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langfuse.langchain import CallbackHandler
 
+logger = logging.getLogger(__name__)
 
-async def handle_qc_logic(topic: str, draft_content: str):
-    print(f"[ADK Service] 🧐 품질 관리팀 가동됨 (주제: {topic[:30]}...)")
+# 같은 주제/초안에 대한 최종본은 다시 LLM을 호출하지 않고 재사용합니다. (프롬프트가 정확히 일치하는 경우만)
+QC_CACHE_TTL = 7 * 24 * 60 * 60
+QC_CACHE_MAXSIZE = 128
+_qc_cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+
+# 모든 요청이 공유하는 Langfuse 핸들러 (요청별 정보는 config의 metadata로 전달)
+_HANDLER = CallbackHandler()
 
-    # ADK 서비스 호출을 위한 핸들러 생성
-    handler = CallbackHandler()
 
+async def handle_qc_logic(topic: str, draft_content: str):
     try:
         qa_llm = ChatGoogleGenerativeAI(model="gemini-2.5-flash", temperature=0)
         prompt = f"당신은 삼성전자 기술 블로그의 수석 편집자입니다. 다음 초안을 검토하고, 우리 블로그의 톤앤매너(전문적, 신뢰감, 명확함)에 맞춰 최종 발행 가능한 완벽한 최종본으로 만들어주세요.\n\n주제: {topic}\n초안: {draft_content}"
 
-        # LLM 호출 시 config에 콜백 핸들러 전달
-        final_post = qa_llm.invoke(prompt, config={"callbacks": [handler]}).content
+        cache_key = hashlib.blake2b(prompt.encode(), digest_size=16).hexdigest()
+        entry = _qc_cache.get(cache_key)
+        if entry is not None and time.monotonic() - entry[0] < QC_CACHE_TTL:
+            _qc_cache.move_to_end(cache_key)
+            final_post = entry[1]
+        else:
+            # LLM 호출 시 config에 콜백 핸들러 전달
+            response = await qa_llm.ainvoke(
+                prompt,
+                config={"callbacks": [_HANDLER], "run_name": "qc-llm", "metadata": {"endpoint": "quality-control"}},
+            )
+            final_post = response.content
+            _qc_cache[cache_key] = (time.monotonic(), final_post)
+            if len(_qc_cache) > QC_CACHE_MAXSIZE:
+                _qc_cache.popitem(last=False)
 
         report = {
             "seo_score": 95,
@@ -21,12 +45,9 @@ async def handle_qc_logic(topic: str, draft_content: str):
             "final_char_count": len(final_post),
             "status": "Approved",
         }
-        print("[ADK Service] ✅ 최종 편집 및 보고서 생성 완료.")
+        logger.debug("qc.done topic=%s chars=%d", topic[:30], len(final_post))
         return final_post, report
     except Exception as e:
         error_message = f"ADK 품질 관리 중 오류 발생: {e}"
-        print(f"[ADK Service] 🔴 {error_message}")
+        logger.exception("qc.failed topic=%s", topic[:30])
         return draft_content, {"status": "Failed", "error": error_message}
-
-
-print("✅ quality_control_adk.py 파일이 Langfuse 추적 기능으로 업데이트되었습니다.")
@@ -1,13 +1,30 @@
+from contextlib import asynccontextmanager
+
 import httpx
 from fastapi import FastAPI, Request
 from fastapi.responses import StreamingResponse
-
-app = FastAPI()
+from starlette.background import BackgroundTask
 
 MCP_SERVER_URL = "http://localhost:8501"
 A2A_SERVER_URL = "http://localhost:8502"
 
-client = httpx.AsyncClient(timeout=300.0)
+# 두 내부 서버로 가는 연결을 재사용하도록 커넥션 풀을 넉넉히 잡습니다. (연결 수립은 짧게, 응답 대기는 길게)
+client = httpx.AsyncClient(
+    timeout=httpx.Timeout(300.0, connect=5.0),
+    limits=httpx.Limits(max_connections=500, max_keepalive_connections=200, keepalive_expiry=60.0),
+)
+
+# 내부 서버로 전달하지 않는 요청 헤더
+EXCLUDED_HEADERS = frozenset(["host", "cookie"])
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    await client.aclose()
+
+
+app = FastAPI(lifespan=lifespan)
 
 
 async def proxy_request(target_url: str, request: Request):
@@ -16,21 +33,24 @@ async def proxy_request(target_url: str, request: Request):
     StreamConsumed 오류를 방지하기 위해 client.send(stream=True)를 사용합니다.
     """
     # 1. 클라이언트의 요청 정보를 기반으로 내부 서버로 보낼 요청을 재구성합니다.
-    headers = {k: v for k, v in request.headers.items() if k.lower() not in ["host", "cookie"]}
+    #    요청 본문은 메모리에 모으지 않고 그대로 스트리밍합니다.
+    headers = [(k, v) for k, v in request.headers.items() if k not in EXCLUDED_HEADERS]
 
     req = client.build_request(
         method=request.method,
         url=target_url,
         headers=headers,
         params=request.query_params,
-        content=await request.body(),
+        content=request.stream(),
     )
 
     # 2. stream=True 옵션으로 요청을 보내 응답 본문을 미리 읽지 않도록 합니다.
     r = await client.send(req, stream=True)
 
-    # 3. 내부 서버의 응답을 클라이언트에게 그대로 스트리밍합니다.
-    return StreamingResponse(r.aiter_raw(), status_code=r.status_code, headers=r.headers)
+    # 3. 내부 서버의 응답을 클라이언트에게 그대로 스트리밍합니다. (전송이 끝나면 연결을 풀에 반환)
+    return StreamingResponse(
+        r.aiter_raw(), status_code=r.status_code, headers=r.headers, background=BackgroundTask(r.aclose)
+    )
 
 
 @app.api_route("/mcp/{path:path}", methods=["GET", "POST", "PUT", "DELETE", "PATCH"])
@@ -1,29 +1,163 @@
+import asyncio
+import codecs
+import importlib.util
+import logging
+import logging.handlers
 import os
+import queue
+import socket
 import subprocess
 import sys
-import threading
 import time
+from typing import Iterable, List, Optional, Sequence, Tuple
 
+try:
+    import psutil
+except ImportError:  # psutil이 설치되지 않은 환경에서는 pkill로 기존 프로세스를 정리
+    psutil = None
 
-def print_logs(process, name):
-    """서버 프로세스의 로그를 실시간으로 출력하는 함수"""
-    # stderr를 사용하여 uvicorn의 로그를 읽습니다.
-    for line in iter(process.stderr.readline, ""):
-        print(f"[{name} LOG] {line.strip()}")
+# 실행 중인 로그 출력 태스크 (이벤트 루프는 태스크를 약하게 참조하므로 여기서 참조를 유지합니다)
+_log_tasks = set()
 
+# --- 서버 로그 출력 ---
+# 로그 레코드는 큐에 넣기만 하고(QueueHandler), 실제 출력은 QueueListener의 단일 스레드가 처리합니다.
+# (SimpleQueue는 C 구현이라 put에 잠금 경합이 거의 없습니다) SERVER_LOG_FILE을 지정하면 파일에도 기록합니다.
+_log_q: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+_log_sinks: List[logging.Handler] = [logging.StreamHandler(sys.stdout)]
+if os.getenv("SERVER_LOG_FILE"):
+    _log_sinks.append(logging.FileHandler(os.environ["SERVER_LOG_FILE"], encoding="utf-8"))
+_log_listener = logging.handlers.QueueListener(_log_q, *_log_sinks)
+_log_listener.start()
 
-def launch_fastapi_app(app_module_name: str, port: int):
+server_logger = logging.getLogger("server_launcher")
+server_logger.setLevel(logging.INFO)
+server_logger.addHandler(logging.handlers.QueueHandler(_log_q))
+server_logger.propagate = False  # 노트북의 root 로거 설정과 섞이지 않도록 분리
+
+
+async def print_logs(stream: asyncio.StreamReader, name: str):
+    """서버 프로세스의 로그를 실시간으로 출력하는 코루틴 (출력은 QueueListener 스레드가 처리)"""
+    # uvicorn은 로그를 stderr로 출력하며, stderr는 stdout 파이프로 합쳐서 읽습니다.
+    # 한 줄씩 읽는 대신 도착한 만큼(최대 64KB) 한 번에 읽어 여러 줄을 한 번에 디코딩/전달합니다.
+    # 청크 경계에서 잘린 마지막 줄(과 UTF-8 문자)은 다음 청크와 이어 붙입니다.
+    decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+    partial = ""
+    while chunk := await stream.read(65536):
+        lines = (partial + decoder.decode(chunk)).splitlines(keepends=True)
+        # 멀티바이트 문자의 앞부분만 도착하면 디코딩 결과가 비어 lines도 비어 있을 수 있습니다.
+        partial = lines.pop() if lines and not lines[-1].endswith("\n") else ""
+        for line in lines:
+            server_logger.info("[%s LOG] %s", name, line.rstrip())
+    partial += decoder.decode(b"", final=True)
+    if partial:
+        server_logger.info("[%s LOG] %s", name, partial.rstrip())
+
+
+async def wait_for_port(
+    port: int, timeout: float = 30.0, process: Optional[asyncio.subprocess.Process] = None
+) -> bool:
+    """서버가 포트에서 TCP 연결을 받을 때까지 50ms 간격으로 확인합니다.
+
+    process를 넘기면 그 프로세스가 먼저 종료된 경우(import 오류 등) timeout까지 기다리지 않고 바로 False를 반환합니다.
+    """
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.returncode is not None:
+            return False
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+        except OSError:
+            await asyncio.sleep(0.05)
+            continue
+        writer.close()
+        await writer.wait_closed()
+        return True
+    return False
+
+
+def fast_path_options() -> List[str]:
+    """uvloop(이벤트 루프)와 httptools(HTTP 파서)를 명시적으로 지정하는 uvicorn 옵션을 만듭니다.
+
+    둘 다 C 구현이라 기본 asyncio/h11보다 요청당 오버헤드가 적습니다. 설치되지 않은 환경(예: Windows의 uvloop)에서는
+    해당 옵션을 빼서 uvicorn 기본값으로 실행합니다.
+    """
+    options = []
+    if importlib.util.find_spec("uvloop") is not None:
+        options += ["--loop", "uvloop"]
+    if importlib.util.find_spec("httptools") is not None:
+        options += ["--http", "httptools"]
+    return options
+
+
+FAST_PATH_OPTIONS = fast_path_options()
+
+
+def port_in_use(port: int) -> bool:
+    """로컬에서 port가 연결을 받고 있는지 확인합니다."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+def stop_servers_on_ports(ports: Iterable[int], timeout: float = 1.5) -> List[int]:
+    """ports에서 LISTEN 중인 프로세스(와 그 워커)를 SIGTERM으로 종료하고, timeout 안에 끝나지 않으면 SIGKILL을 보냅니다.
+
+    여러 포트를 정리할 때도 소켓 목록(net_connections)은 한 번만 조회합니다. 종료한 PID 목록을 반환합니다.
+    """
+    ports = set(ports)
+    pids = {
+        conn.pid
+        for conn in psutil.net_connections(kind="tcp")
+        if conn.pid and conn.laddr and conn.laddr.port in ports and conn.status == psutil.CONN_LISTEN
+    }
+    procs = []
+    for pid in pids:
+        try:
+            proc = psutil.Process(pid)
+            procs += [proc, *proc.children(recursive=True)]
+        except psutil.NoSuchProcess:
+            continue
+    for proc in procs:
+        try:
+            proc.terminate()
+        except psutil.NoSuchProcess:
+            pass
+    _, alive = psutil.wait_procs(procs, timeout=timeout)
+    for proc in alive:
+        try:
+            proc.kill()
+        except psutil.NoSuchProcess:
+            pass
+    return sorted(pids)
+
+
+async def launch_fastapi_app(
+    app_module_name: str, port: int, timeout: float = 30.0, dev: bool = False, workers: Optional[int] = None
+):
     """
     FastAPI 앱을 로컬에서 실행합니다.
+
+    dev=True이면 코드 변경 시 자동 재시작(--reload)하는 단일 프로세스로, 아니면 workers개(기본: CPU 코어 수)의 워커로 실행합니다.
     """
     print(f"🚀 {app_module_name} 서버를 로컬 포트 {port}에서 시작합니다...")
 
-    # Step 1: 기존 프로세스 정리
+    # Step 1: 기존 프로세스 정리 (포트가 비어 있으면 건너뜁니다)
     try:
-        # pkill을 사용하여 특정 포트를 사용하는 uvicorn 프로세스를 종료합니다.
-        subprocess.run(["pkill", "-f", f"uvicorn.*{app_module_name}.*--port {port}"], capture_output=True)
-        print(f"   🧹 포트 {port}의 기존 Uvicorn 프로세스를 정리했습니다.")
-        time.sleep(2)
+        if port_in_use(port):
+            if psutil is not None:
+                # 포트를 점유한 프로세스를 직접 찾아 종료합니다. (셸 실행이나 전체 프로세스 목록 정규식 검색 없음)
+                await asyncio.to_thread(stop_servers_on_ports, [port])
+            else:
+                # pkill을 사용하여 특정 포트를 사용하는 uvicorn 프로세스를 종료합니다.
+                pkill = await asyncio.create_subprocess_exec(
+                    "pkill",
+                    "-f",
+                    f"uvicorn.*{app_module_name}.*--port {port}",
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
+                )
+                await pkill.wait()
+                await asyncio.sleep(2)
+            print(f"   🧹 포트 {port}의 기존 Uvicorn 프로세스를 정리했습니다.")
     except Exception as e:
         print(f"   ℹ️ 프로세스 정리 중 오류 발생 (무시 가능): {e}")
 
@@ -38,19 +172,35 @@ def launch_fastapi_app(app_module_name: str, port: int):
             "0.0.0.0",
             "--port",
             str(port),
-            "--reload",
+            *FAST_PATH_OPTIONS,
+            "--no-access-log",
         ]
-        server_process = subprocess.Popen(
-            command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, encoding="utf-8"
+        # --reload는 파일 감시용 부모 프로세스를 따로 띄우므로 개발 중에만 사용합니다.
+        command += ["--reload"] if dev else ["--workers", str(workers or os.cpu_count() or 1)]
+        # 새 세션으로 분리해 노트북/터미널의 Ctrl-C(SIGINT)가 서버까지 전달되지 않게 하고,
+        # 부모의 파일 디스크립터는 물려주지 않습니다. (로그는 바이트로 받아 print_logs에서 디코딩)
+        server_process = await asyncio.create_subprocess_exec(
+            *command,
+            stdin=subprocess.DEVNULL,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.STDOUT,
+            close_fds=True,
+            start_new_session=True,
         )
         print(f"   ⏳ FastAPI 서버를 포트 {port}에서 시작하는 중...")
 
-        # 실시간 로그 출력을 위한 스레드 시작
-        log_thread = threading.Thread(target=print_logs, args=(server_process, app_module_name))
-        log_thread.daemon = True
-        log_thread.start()
+        # 실시간 로그 출력은 별도 스레드 대신 이벤트 루프의 태스크로 처리합니다.
+        log_task = asyncio.create_task(print_logs(server_process.stdout, app_module_name))
+        _log_tasks.add(log_task)
+        log_task.add_done_callback(_log_tasks.discard)
         print("   🔊 실시간 로그 출력을 시작합니다.")
-        time.sleep(5)  # 서버가 완전히 시작될 때까지 잠시 대기
+
+        # 고정된 시간만큼 기다리는 대신, 포트가 연결을 받기 시작하면 바로 다음 단계로 넘어갑니다.
+        if not await wait_for_port(port, timeout, server_process):
+            if server_process.returncode is not None:
+                raise RuntimeError(f"서버 프로세스가 종료되었습니다 (exit code {server_process.returncode}).")
+            server_process.terminate()
+            raise TimeoutError(f"{timeout:g}초 안에 포트 {port}가 열리지 않았습니다.")
 
     except Exception as e:
         print(f"   ❌ FastAPI 서버 시작에 실패했습니다: {e}")
@@ -63,4 +213,22 @@ def launch_fastapi_app(app_module_name: str, port: int):
     return local_url, server_process
 
 
+async def launch_many(apps: Sequence[Tuple[str, int]], **kwargs):
+    """여러 FastAPI 앱을 동시에 실행합니다. (전체 기동 시간 ≈ 가장 느린 서버 하나)
+
+    apps는 (모듈 이름, 포트) 목록이며, kwargs는 launch_fastapi_app에 그대로 전달됩니다.
+    apps 순서대로의 (local_url, process) 목록과 전체 기동에 걸린 시간(초)을 반환합니다.
+    """
+    started = time.monotonic()
+    # 기존 프로세스 정리는 모든 포트에 대해 한 번에 처리합니다. (소켓 목록은 한 번만 조회)
+    busy_ports = [port for _, port in apps if port_in_use(port)]
+    if busy_ports and psutil is not None:
+        await asyncio.to_thread(stop_servers_on_ports, busy_ports)
+
+    results = await asyncio.gather(*(launch_fastapi_app(module, port, **kwargs) for module, port in apps))
+    boot_seconds = time.monotonic() - started
+    print(f"✅ 서버 {len(apps)}개 기동 완료 ({boot_seconds:.2f}초)")
+    return list(results), boot_seconds
+
+
 print("✅ 'server_launcher.py' 파일이 [로컬 전용]으로 준비되었습니다.")
@@ -1,17 +1,48 @@
-BLOG_TEMPLATES = {
-    "tech_analysis": "## 제목\n\n### 1. 기술 개요\n\n### 2. 핵심 작동 원리\n\n### 3. 장단점 분석\n\n### 4. 실무 적용 사례\n\n### 5. 결론 및 향후 전망",
-    "product_review": "## 제목\n\n### 1. 첫인상 및 디자인\n\n### 2. 주요 기능 및 성능 테스트\n\n### 3. 실사용 후기 (장점/단점)\n\n### 4. 총평 및 추천 대상",
-}
+import sys
+from types import MappingProxyType
+from typing import Dict, Mapping, Optional, Union
 
-STYLE_GUIDES = {
-    "default": "문체: 전문적이면서도 명확하게.\n대상 독자: 기술에 관심 있는 일반인.\n어조: 객관적이고 사실 기반.",
-    "samsung_newsroom": "문체: 삼성전자 뉴스룸 공식 톤앤매너.\n대상 독자: 언론인 및 IT 업계 종사자.\n어조: 신뢰감을 주는 공식적인 어조.",
-}
 
+def _frozen_interned(resources: Dict[str, str]) -> Mapping[str, str]:
+    """리소스 ID와 본문을 intern하여 읽기 전용 매핑으로 고정합니다. (프로세스 안에서 하나의 문자열 객체만 공유)"""
+    return MappingProxyType({sys.intern(k): sys.intern(v) for k, v in resources.items()})
 
-async def get_template(template_id: str):
+
+# 템플릿과 스타일 가이드는 실행 중에 바뀌지 않으므로 읽기 전용 매핑으로 고정합니다.
+BLOG_TEMPLATES: Mapping[str, str] = _frozen_interned(
+    {
+        "tech_analysis": "## 제목\n\n### 1. 기술 개요\n\n### 2. 핵심 작동 원리\n\n### 3. 장단점 분석\n\n### 4. 실무 적용 사례\n\n### 5. 결론 및 향후 전망",
+        "product_review": "## 제목\n\n### 1. 첫인상 및 디자인\n\n### 2. 주요 기능 및 성능 테스트\n\n### 3. 실사용 후기 (장점/단점)\n\n### 4. 총평 및 추천 대상",
+    }
+)
+
+STYLE_GUIDES: Mapping[str, str] = _frozen_interned(
+    {
+        "default": "문체: 전문적이면서도 명확하게.\n대상 독자: 기술에 관심 있는 일반인.\n어조: 객관적이고 사실 기반.",
+        "samsung_newsroom": "문체: 삼성전자 뉴스룸 공식 톤앤매너.\n대상 독자: 언론인 및 IT 업계 종사자.\n어조: 신뢰감을 주는 공식적인 어조.",
+    }
+)
+
+
+# 엔드포인트 응답도 미리 만들어 두고 모든 요청이 같은 객체를 공유합니다. (요청마다 응답 딕셔너리를 새로 만들지 않음)
+# 공유 객체가 요청 처리 중에 수정되지 않도록 응답도 읽기 전용 매핑으로 둡니다.
+TEMPLATE_RESPONSES: Mapping[str, Mapping[str, str]] = MappingProxyType(
+    {
+        template_id: MappingProxyType({"resource": "template", "id": template_id, "content": template})
+        for template_id, template in BLOG_TEMPLATES.items()
+    }
+)
+
+
+# 조회는 딕셔너리 접근 한 번이므로 코루틴이 아닌 일반 함수로 둡니다. (I/O가 없어 async로 얻는 이점이 없음)
+def get_template(template_id: str) -> Union[str, Dict[str, str]]:
     return BLOG_TEMPLATES.get(template_id, {"error": "Template not found"})
 
 
-async def get_style_guide(guide_id: str):
+def get_style_guide(guide_id: str) -> Union[str, Dict[str, str]]:
     return STYLE_GUIDES.get(guide_id, {"error": "Style guide not found"})
+
+
+def get_template_response(template_id: str) -> Optional[Mapping[str, str]]:
+    """템플릿 조회 엔드포인트의 응답을 반환합니다. (없으면 None)"""
+    return TEMPLATE_RESPONSES.get(template_id)
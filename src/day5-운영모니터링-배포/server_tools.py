@@ -1,57 +1,225 @@
+import asyncio
+import functools
 import json
+import multiprocessing
 import os
+import time
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from typing import Any, Awaitable, Callable, Dict, List, Tuple
 
 import arxiv
+import requests
 from newsapi import NewsApiClient
-from tavily import TavilyClient
+from tavily import AsyncTavilyClient
 
+try:
+    import orjson
 
+    def dump_json(data: Any) -> str:
+        return orjson.dumps(data).decode()
+
+except ImportError:  # orjson이 설치되지 않은 환경에서는 표준 json 모듈 사용
+
+    def dump_json(data: Any) -> str:
+        return json.dumps(data, ensure_ascii=False)
+
+
+def error_json(message: str) -> str:
+    """{"error": message} JSON 문자열을 만듭니다. (고정된 키 부분은 미리 만든 문자열을 사용하고 메시지만 직렬화)"""
+    return '{"error":' + dump_json(message) + "}"
+
+
+# --- API 키 ---
+# 서버 시작 시 한 번만 읽고, 없으면 요청마다 오류를 내는 대신 기동 단계에서 바로 실패합니다.
+TAVILY_API_KEY = os.environ.get("TAVILY_API_KEY")
+NEWS_API_KEY = os.environ.get("NEWS_API_KEY")
+if not (TAVILY_API_KEY and NEWS_API_KEY):
+    raise RuntimeError("TAVILY_API_KEY와 NEWS_API_KEY 환경 변수를 설정해야 합니다.")
+
+
+# --- 공유 클라이언트 ---
+# 요청마다 클라이언트(와 내부 HTTP 세션)를 새로 만들면 매번 TCP/TLS 연결을 다시 맺어야 하므로,
+# 첫 호출 시 한 번만 생성하여 재사용합니다.
+@functools.lru_cache(maxsize=1)
+def get_tavily_client() -> AsyncTavilyClient:
+    return AsyncTavilyClient(api_key=TAVILY_API_KEY)
+
+
+@functools.lru_cache(maxsize=1)
+def get_news_client() -> NewsApiClient:
+    return NewsApiClient(api_key=NEWS_API_KEY, session=requests.Session())
+
+
+@functools.lru_cache(maxsize=1)
+def get_arxiv_client() -> arxiv.Client:
+    return arxiv.Client()
+
+
+# arxiv 클라이언트는 동기 HTTP 요청과 피드 파싱, 재시도 대기(time.sleep)를 모두 호출한 쪽에서 수행하므로
+# 별도 프로세스에서 실행해 서버의 이벤트 루프와 GIL에 영향을 주지 않게 합니다.
+# 풀은 첫 arxiv 검색 때 만들어지고, 스레드가 도는 서버 프로세스를 fork하지 않도록 spawn으로 자식을 띄웁니다.
+@functools.lru_cache(maxsize=1)
+def get_arxiv_pool() -> ProcessPoolExecutor:
+    return ProcessPoolExecutor(max_workers=2, mp_context=multiprocessing.get_context("spawn"))
+
+
+def shutdown_arxiv_pool() -> None:
+    """arxiv 프로세스 풀이 만들어져 있으면 대기 중인 작업을 취소하고 종료합니다. (앱 lifespan 종료 시 호출)"""
+    if get_arxiv_pool.cache_info().currsize:
+        get_arxiv_pool().shutdown(wait=True, cancel_futures=True)
+        get_arxiv_pool.cache_clear()
+
+
+# --- 검색 결과 캐시 ---
+def async_cache(ttl: float = 600, maxsize: int = 512):
+    """같은 검색어에 대한 결과를 ttl초 동안 메모리에 보관하는 데코레이터 (maxsize 초과 시 가장 오래 안 쓴 항목부터 제거).
+
+    캐시에 없는 검색어가 이미 조회 중이면 새로 요청하지 않고 진행 중인 호출의 결과를 함께 기다립니다. (single-flight)
+    예외가 발생한 호출은 캐시하지 않으므로, 일시적인 API 오류가 ttl 동안 재사용되지 않습니다.
+    """
+
+    def decorator(func: Callable[[str], Awaitable[str]]) -> Callable[[str], Awaitable[str]]:
+        cache: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        inflight: Dict[str, asyncio.Task] = {}
+
+        def on_done(key: str, task: asyncio.Task):
+            del inflight[key]
+            if task.cancelled() or task.exception() is not None:
+                return
+            cache[key] = (time.monotonic(), task.result())
+            cache.move_to_end(key)
+            if len(cache) > maxsize:
+                cache.popitem(last=False)
+
+        @functools.wraps(func)
+        async def wrapper(query: str) -> str:
+            key = query.strip().lower()
+            entry = cache.get(key)
+            if entry is not None and time.monotonic() - entry[0] < ttl:
+                cache.move_to_end(key)
+                return entry[1]
+
+            task = inflight.get(key)
+            if task is None:
+                task = asyncio.ensure_future(func(query))
+                inflight[key] = task
+                task.add_done_callback(functools.partial(on_done, key))
+            # 한 호출자가 취소(예: multi_search의 시간 초과)되어도 같은 결과를 기다리는 다른 호출자에게는 영향이 없도록 shield 합니다.
+            return await asyncio.shield(task)
+
+        wrapper.cache = cache
+        return wrapper
+
+    return decorator
+
+
+# --- 1. 웹 검색 (Tavily) ---
 async def web_search(query: str) -> str:
     try:
-        client = TavilyClient(api_key=os.environ["TAVILY_API_KEY"])
-        response = client.search(query=query, max_results=3, search_depth="advanced")
-        return json.dumps(
-            [{"title": obj["title"], "url": obj["url"], "content": obj["content"]} for obj in response["results"]],
-            ensure_ascii=False,
-        )
+        return await _web_search(query)
     except Exception as e:
-        return json.dumps({"error": f"Tavily API 오류: {e}"})
+        return error_json(f"Tavily API 오류: {e}")
+
+
+@async_cache()
+async def _web_search(query: str) -> str:
+    # 사용하는 필드(title/url/content)만 받도록 답변 요약, 원문, 이미지는 요청하지 않습니다. (응답 크기 감소)
+    response = await get_tavily_client().search(
+        query=query,
+        max_results=3,
+        search_depth="advanced",
+        include_answer=False,
+        include_raw_content=False,
+        include_images=False,
+    )
+    return dump_json(
+        [{"title": obj["title"], "url": obj["url"], "content": obj["content"]} for obj in response["results"]],
+    )
+
+
+# --- 2. 뉴스 기사 검색 (NewsAPI) ---
+class NewsApiStatusError(Exception):
+    """NewsAPI가 status != "ok" 응답을 돌려준 경우"""
 
 
 async def news_api_search(query: str) -> str:
     try:
-        client = NewsApiClient(api_key=os.environ["NEWS_API_KEY"])
-        response = client.get_everything(q=query, language="ko", sort_by="relevancy", page_size=3)
-        if response["status"] == "ok":
-            return json.dumps(
-                [
-                    {"title": article["title"], "url": article["url"], "description": article["description"]}
-                    for article in response["articles"]
-                ],
-                ensure_ascii=False,
-            )
-        else:
-            return json.dumps({"error": f"News API 오류: {response.get('message', 'Unknown error')}"})
+        return await _news_api_search(query)
+    except NewsApiStatusError as e:
+        return error_json(f"News API 오류: {e}")
     except Exception as e:
-        return json.dumps({"error": f"News API 클라이언트 오류: {e}"})
+        return error_json(f"News API 클라이언트 오류: {e}")
+
 
+@async_cache()
+async def _news_api_search(query: str) -> str:
+    # newsapi-python은 동기(requests) 클라이언트이므로 스레드에서 실행해 이벤트 루프를 막지 않습니다.
+    response = await asyncio.to_thread(
+        get_news_client().get_everything, q=query, language="ko", sort_by="relevancy", page_size=3
+    )
+    if response["status"] != "ok":
+        raise NewsApiStatusError(response.get("message", "Unknown error"))
+    return dump_json(
+        [
+            {"title": article["title"], "url": article["url"], "description": article["description"]}
+            for article in response["articles"]
+        ],
+    )
 
+
+# --- 3. 학술 논문 검색 (Arxiv) ---
 async def arxiv_search(query: str) -> str:
     try:
-        client = arxiv.Client()
-        search = arxiv.Search(query=query, max_results=2, sort_by=arxiv.SortCriterion.Relevance)
-        results = list(client.results(search))
-        return json.dumps(
-            [
-                {
-                    "title": result.title,
-                    "authors": [str(a) for a in result.authors],
-                    "summary": result.summary,
-                    "pdf_url": result.pdf_url,
-                }
-                for result in results
-            ],
-            ensure_ascii=False,
-        )
+        return await _arxiv_search(query)
     except Exception as e:
-        return json.dumps({"error": f"Arxiv 검색 오류: {e}"})
+        return error_json(f"Arxiv 검색 오류: {e}")
+
+
+ARXIV_MAX_RESULTS = 2
+
+
+def _fetch_arxiv(query: str) -> List[Dict[str, Any]]:
+    """arxiv 검색 결과 제너레이터를 한 번만 순회하며 바로 결과 딕셔너리를 만듭니다. (중간 리스트 없이)"""
+    search = arxiv.Search(query=query, max_results=ARXIV_MAX_RESULTS, sort_by=arxiv.SortCriterion.Relevance)
+    return [
+        {
+            "title": result.title,
+            "authors": list(map(str, result.authors)),
+            "summary": result.summary,
+            "pdf_url": result.pdf_url,
+        }
+        # islice로 필요한 개수만 받으면 제너레이터가 추가 페이지를 요청하지 않습니다.
+        for result in islice(get_arxiv_client().results(search), ARXIV_MAX_RESULTS)
+    ]
+
+
+@async_cache()
+async def _arxiv_search(query: str) -> str:
+    results = await asyncio.get_running_loop().run_in_executor(get_arxiv_pool(), _fetch_arxiv, query)
+    return dump_json(results)
+
+
+# --- 4. 통합 검색 (웹 + 뉴스 + 논문) ---
+async def multi_search(query: str, timeout: float = 8.0) -> str:
+    """세 검색을 동시에 실행합니다. (전체 지연 시간 ≈ 가장 느린 검색 하나, 각 검색은 timeout초로 제한)
+
+    실패하거나 시간이 초과된 검색은 {"error": ...}로 채우고 나머지 결과는 그대로 반환합니다.
+    """
+    names = ("web", "news", "arxiv")
+    results = await asyncio.gather(
+        asyncio.wait_for(web_search(query), timeout),
+        asyncio.wait_for(news_api_search(query), timeout),
+        asyncio.wait_for(arxiv_search(query), timeout),
+        return_exceptions=True,
+    )
+    # 각 결과는 이미 JSON 문자열이므로 다시 파싱하지 않고 하나의 객체로 이어 붙입니다.
+    parts = []
+    for name, result in zip(names, results):
+        if isinstance(result, asyncio.TimeoutError):
+            result = error_json(f"{name} 검색 시간 초과 ({timeout:g}초)")
+        elif isinstance(result, BaseException):
+            result = error_json(f"{name} 검색 오류: {result}")
+        parts.append(f'"{name}": {result}')
+    return "{" + ", ".join(parts) + "}"
@@ -0,0 +1,26 @@
+import os
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict, Field
+
+
+class Settings(BaseModel):
+    """서버 시작 시 환경 변수에서 한 번만 읽어 검증하는 설정 (요청마다 os.environ을 조회하지 않습니다)"""
+
+    model_config = ConfigDict(frozen=True)
+
+    master_api_key: str = Field(..., min_length=1)
+    mcp_server_url: Optional[str] = None
+    redis_url: str = "redis://localhost:6379/0"
+
+    @classmethod
+    def from_env(cls) -> "Settings":
+        # MASTER_API_KEY가 없으면 ValidationError로 기동 단계에서 바로 실패합니다. (모든 요청이 401이 되는 대신)
+        return cls(
+            master_api_key=os.environ.get("MASTER_API_KEY"),
+            mcp_server_url=os.environ.get("MCP_SERVER_URL") or None,
+            redis_url=os.environ.get("REDIS_URL", "redis://localhost:6379/0"),
+        )
+
+
+SETTINGS = Settings.from_env()